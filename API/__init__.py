@@ -6,12 +6,19 @@ from flask_mail import Mail
 from flask_cors import CORS
 from flask_migrate import Migrate
 from API.config import Config
+from API.lib.json_provider import OrjsonProvider
+from API.lib.cache import Cache
+from API.lib.mail_transport import MailTransport
+from API.lib.email_templates import EmailTemplates
 
 db = SQLAlchemy()
 mail = Mail()
 bcrypt = Bcrypt()
 migrate = Migrate()
 cors = CORS()
+cache = Cache()
+mail_transport = MailTransport()
+email_templates = EmailTemplates()
 from flasgger import Swagger
 from API.swaggerUI.swagger_config import swagger_config, swagger_template
 
@@ -20,7 +27,7 @@ def make_celery(app):
         app.import_name,
         broker=Config.CELERY_BROKER_URL,
         backend=Config.CELERY_RESULT_BACKEND,
-        include=['CRON.celery_tasks']
+        include=['CRON.celery_tasks', 'API.lib.notification_tasks']
     )
     celery.conf.update(
         task_serializer=Config.CELERY_TASK_SERIALIZER,
@@ -41,6 +48,7 @@ def make_celery(app):
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config.from_object(Config)
 
     db.init_app(app)
@@ -48,6 +56,9 @@ def create_app():
     mail.init_app(app)
     migrate.init_app(app, db)
     cors.init_app(app, supports_credentials=True)
+    cache.init_app(app)
+    mail_transport.init_app(app)
+    email_templates.init_app(app)
     
     celery = make_celery(app)
     app.extensions['celery'] = celery
@@ -68,6 +79,7 @@ def create_app():
     from API.admin.routes import admin_blueprint
     from API.messaging.routes import messaging_blueprint
     from API.gallery.routes import gallery_blueprint
+    from API.lib.metrics import rebuild_metrics_command
 
     app.register_blueprint(clients_blueprint)
     app.register_blueprint(appointment_blueprint)
@@ -85,6 +97,8 @@ def create_app():
     app.register_blueprint(messaging_blueprint)
     app.register_blueprint(gallery_blueprint)
 
+    app.cli.add_command(rebuild_metrics_command)
+
     return app
 
 celery = make_celery(create_app())
\ No newline at end of file
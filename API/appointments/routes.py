@@ -1,5 +1,5 @@
 from typing import Union, Optional, Any
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 from API.models import Appointment, Service, Staff, Client, Business
 from flask import Blueprint, request, jsonify
@@ -9,17 +9,24 @@ from API.lib.auth import (
     verify_api_key,
     business_verification_required)
 from API.lib.data_serializer import serialize_appointment, serialize_client
-from API.lib.sendSMS import send_sms
 from API.lib.utils import check_staff_availability
+from API.lib.staff_schedule import StaffSchedule, service_duration, appointment_ends_at, is_staff_overlap_error
 from API import db, bcrypt
 from datetime import datetime, timedelta, time, date
-from API.lib.SMS_messages import reschedule_appointment_composer, new_appointment_notification_message, \
-    appointment_remainder_message
-from API.lib.checkBusinessClosed import check_business_closed
-from API.lib.send_mail import appointment_confirmation_email, send_ask_for_review_mail
+from API.lib.SMS_messages import reschedule_appointment_composer, new_appointment_notification_message
+from API.lib.checkBusinessClosed import check_business_closed, business_hours
+from API.lib.notification_tasks import queue_email, queue_message, send_appointment_reminders
+from API.lib.notification_router import route, EMAIL, CONFIRMATION_CHANNELS, MESSAGE_CHANNELS
+from API.lib.metrics import track_completed_appointment
+from API.lib.query_options import client_appointment_options, business_appointment_options
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 
 appointment_blueprint = Blueprint("appointments", __name__, url_prefix="/API/appointments")
 
+SLOT_INTERVAL_MINUTES: int = 30
+MIN_SLOT_INTERVAL_MINUTES: int = 5
+MAX_SLOT_RANGE_DAYS: int = 31
+
 
 @appointment_blueprint.route("/book", methods=["POST"])
 @client_login_required
@@ -76,7 +83,8 @@ def book_appointment(client):
             business_id=business.id,
             client_id=client.id,
             staff_id=staff_id if staff_id else None,
-            service_id=service.id
+            service_id=service.id,
+            ends_at=appointment_ends_at(appointment_date, appointment_time, service)
         )
 
         # Avoid Booking multiple appointments scheduled at the same time
@@ -85,19 +93,28 @@ def book_appointment(client):
         if appointment:
             return jsonify({"message": "You have another appointment scheduled at this time."}), 400
 
-        db.session.add(new_appointment)
-        db.session.commit()
-
-        email_sent = appointment_confirmation_email(
-        client_name=client.name.split()[0],
-        appointment_date=date.today(),   
-        appointment_time=datetime.now().time(),  
-        business_name=business.business_name,
-        business_address=business.formatted_address,
-        latitude=business.latitude,
-        longitude=business.longitude,
-        place_id=business.place_id,
-        recipient=client.email
+        try:
+            db.session.add(new_appointment)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not is_staff_overlap_error(e):
+                raise
+            # Another booking for the same staff member got in first
+            return jsonify({"message": "The Staff you selected is already booked at this time."}), 409
+
+        queue_email(
+            "appointment_confirmation",
+            idempotency_key=f"appointment_confirmation:{new_appointment.id}",
+            client_name=client.name.split()[0],
+            appointment_date=appointment_date.date().isoformat(),
+            appointment_time=appointment_time.isoformat(),
+            business_name=business.business_name,
+            business_address=business.formatted_address,
+            latitude=business.latitude,
+            longitude=business.longitude,
+            place_id=business.place_id,
+            recipient=client.email
         )
 
         appointment_message = new_appointment_notification_message(
@@ -107,8 +124,11 @@ def book_appointment(client):
             service=service.service,
             business=business.business_name
         )
-        send_sms(client.phone, appointment_message)
-        return jsonify({"message": "Booking Successful. Check your email for confirmation details" if email_sent else "Booking Successful. Please check your email for confirmation details after a while"}), 200
+        channel: str = route(new_appointment.notification_mode, client.notification_channel, CONFIRMATION_CHANNELS)
+        if channel != EMAIL:
+            queue_message(channel, client.phone, appointment_message,
+                          idempotency_key=f"appointment_{channel}:{new_appointment.id}")
+        return jsonify({"message": "Booking Successful. Check your email for confirmation details"}), 200
     except KeyError as e:
         return jsonify({"message": f"Missing required field: {str(e)}"}), 400
     except Exception as e:
@@ -200,19 +220,31 @@ def book_appointment_on_web():
                 business_id=business.id,
                 staff_id=staff_id if staff_id else None,
                 client_id=client.id,
-                service_id=service.id
+                service_id=service.id,
+                ends_at=appointment_ends_at(appointment_date, appointment_time, service)
             )
             db.session.add(appointment)
             db.session.commit()
 
+        except IntegrityError as db_err:
+            db.session.rollback()
+            if not is_staff_overlap_error(db_err):
+                return jsonify({"message": "A database error occurred", "error": str(db_err)}), 500
+            # Another booking for the same staff member got in first
+            return jsonify({
+                "message": "The Staff you selected is already booked at this time. "
+                           "Please book with a different staff or let us assign you someone"
+            }), 409
         except SQLAlchemyError as db_err:
             db.session.rollback()
             return jsonify({"message": "A database error occurred", "error": str(db_err)}), 500
 
-        email_sent = appointment_confirmation_email(
+        queue_email(
+            "appointment_confirmation",
+            idempotency_key=f"appointment_confirmation:{appointment.id}",
             client_name=client.name.split()[0],
-            appointment_date=appointment_date,
-            appointment_time=appointment_time,
+            appointment_date=appointment_date.isoformat(),
+            appointment_time=appointment_time.isoformat(),
             business_name=business.business_name,
             business_address=business.formatted_address,
             latitude=business.latitude,
@@ -229,9 +261,11 @@ def book_appointment_on_web():
             business=business.business_name
         )
 
-        send_sms(client.phone, sms_message)
+        channel: str = route(appointment.notification_mode, client.notification_channel, CONFIRMATION_CHANNELS)
+        if channel != EMAIL:
+            queue_message(channel, client.phone, sms_message, idempotency_key=f"appointment_{channel}:{appointment.id}")
 
-        return jsonify({"message": "Booking Successful. Check your email for confirmation details" if email_sent else "Booking Successful. Please check your email for confirmation details after a while"}), 200
+        return jsonify({"message": "Booking Successful. Check your email for confirmation details"}), 200
     except Exception as e:
         return jsonify({"message": "Failed to book appointment due to unexpected error", "error": str(e)}), 400
 
@@ -276,12 +310,31 @@ def reschedule_appointment(client, appointment_id):
         if appointments_booked_same_time:
             return jsonify({"message": "You have another appointment scheduled at this time."}), 400
 
+        assigned_staff: Optional[Staff] = staff or appointment.staff
+        if assigned_staff:
+            overlap: bool = check_staff_availability(
+                staff=assigned_staff,
+                service=appointment.service,
+                appointment_date=appointment_date,
+                appointment_time=appointment_time,
+                exclude_appointment_id=appointment.id
+            )
+            if overlap:
+                return jsonify({"message": "The Staff you selected is already booked at this time."}), 400
+
         appointment.time = appointment_time
         appointment.date = appointment_date
+        appointment.ends_at = appointment_ends_at(appointment_date, appointment_time, appointment.service)
         appointment.staff_id = staff.id if staff else appointment.staff_id
         appointment.comment = comment if comment != "" else appointment.comment
         appointment.notification_mode = notification_method if notification_method != "" else appointment.notification_mode
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not is_staff_overlap_error(e):
+                raise
+            return jsonify({"message": "The Staff you selected is already booked at this time."}), 409
 
         client: Client = appointment.client
         message: str = reschedule_appointment_composer(
@@ -292,7 +345,13 @@ def reschedule_appointment(client, appointment_id):
             business=appointment.business.business_name
         )
 
-        send_sms(appointment.client.phone, message)
+        channel: str = route(appointment.notification_mode, client.notification_channel, MESSAGE_CHANNELS)
+        queue_message(
+            channel,
+            client.phone,
+            message,
+            idempotency_key=f"reschedule_{channel}:{appointment.id}:{appointment.date}:{appointment.time}"
+        )
         return jsonify({"message": "Appointment has been rescheduled"}), 200
     except Exception:
         return jsonify ({"message": "Failed to reschedule due to an unexpected issue"}), 400
@@ -335,11 +394,19 @@ def cancel_appointment(client, appointment_id):
 @client_login_required
 def my_appointments(client):
     """
-        Fetch the client's appointments: Last appointment, upcoming
+        Fetch the client's appointments: Last appointment, upcoming. One page at a time, latest first
         :param client:
-        :return:
+        :return: 200, 400, 404
     """
-    appointments: list = Appointment.query.filter_by(client_id=client.id).order_by(Appointment.date.desc()).all()
+    cursor, limit = page_args()
+    query = Appointment.query.options(*client_appointment_options()).filter_by(client_id=client.id)
+    try:
+        appointments, next_cursor = keyset_paginate(
+            query, (Appointment.date, Appointment.time, Appointment.id), cursor, limit
+        )
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
+
     cancelled_appointments: list = []
     upcoming_appointments: list = []
     previous_appointments: list = []
@@ -369,7 +436,8 @@ def my_appointments(client):
             "message": "Success",
             "cancelled": cancelled_appointments,
             "upcoming": upcoming_appointments,
-            "previous": previous_appointments
+            "previous": previous_appointments,
+            "nextCursor": next_cursor
         }
     ), 200
 
@@ -420,21 +488,27 @@ def assign_appointment(business, appointment_id):
 @business_verification_required
 def fetch_business_appointments(business):
     """
-        Fetch all appointments booked with the logged-in business. Exc: Cancelled and Completed
+        Fetch appointments booked with the logged-in business, latest first. Exc: Cancelled
         :param business: Logged-in
-        :return: 200
+        :return: 200, 400
     """
     today: datetime = datetime.today()
-    appointments: list = business.appointments \
-        .order_by(Appointment.date.desc(), Appointment.time.desc()) \
-        .filter(~Appointment.cancelled).all()
+    cursor, limit = page_args()
+    query = business.appointments.options(*business_appointment_options()).filter(~Appointment.cancelled)
+    try:
+        appointments, next_cursor = keyset_paginate(
+            query, (Appointment.date, Appointment.time, Appointment.id), cursor, limit
+        )
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
 
     all_appointments: list = []
 
     for appointment in appointments:
         combined_datetime: datetime = datetime.combine(appointment.date, appointment.time)
-        appointment_duration: int = int(float(appointment.service.estimated_service_time) * 60)
-        appointment_ends: datetime = combined_datetime + timedelta(minutes=appointment_duration)
+        appointment_ends: datetime = appointment.ends_at or appointment_ends_at(
+            appointment.date, appointment.time, appointment.service
+        )
         staff: str = ""
 
         if appointment.staff:
@@ -448,7 +522,7 @@ def fetch_business_appointments(business):
         serialized_appointment["calendarId"] = "past" if appointment_ends < today else "upcoming"
         all_appointments.append(serialized_appointment)
 
-    return jsonify({"appointments": all_appointments}), 200
+    return jsonify({"appointments": all_appointments, "nextCursor": next_cursor}), 200
 
 
 @appointment_blueprint.route("/end_appointment/<int:appointment_id>", methods=["PUT"])
@@ -478,17 +552,20 @@ def end_appointment(business, appointment_id):
             return jsonify({"message": "You can't end a future appointment"}), 400
 
         appointment.completed = True
+        track_completed_appointment(appointment)
         db.session.commit()
 
         # Send a notification with the review link
-        email_sent = send_ask_for_review_mail(
+        queue_email(
+            "ask_for_review",
+            idempotency_key=f"ask_for_review:{appointment.id}",
             url=f"https://www.pamba.africa/reviews/new/{appointment.id}",
             business_name=business.business_name,
             name=appointment.client.name,
             recipient=appointment.client.email
         )
         return jsonify({
-            "message": "Appointment ended. Review request email sent to the client." if email_sent else "Appointment ended, but failed to send review request email to the client.",
+            "message": "Appointment ended. Review request email sent to the client.",
             "appointment": serialize_appointment(appointment)
             }), 200
     except Exception as e:
@@ -510,31 +587,82 @@ def fetch_single_appointment(appointment_id):
     return jsonify({"appointment": serialize_appointment(appointment)}), 200
 
 
-@appointment_blueprint.route("/send_reminder", methods=["GET"])
+@appointment_blueprint.route("/available-slots/<int:service_id>", methods=["GET"])
 @verify_api_key
-def send_appointment_reminder():
+def fetch_available_slots(service_id):
     """
-        Send reminder for upcoming appointments
-        Reminder can be sent via SMS or whatsapp
-        :return:
+        Fetch every bookable slot for a service across all the business's staff over a date range.
+        Query params: start (dd-mm-yyyy), end (dd-mm-yyyy, defaults to start), interval (minutes, defaults to 30)
+        :param service_id: ID of the service being booked
+        :return: 200, 400, 404
     """
-    today: date = datetime.today().date()
-    appointments: list = Appointment.query.filter(Appointment.date == today, ~Appointment.cancelled, ~Appointment.completed)\
-        .all()
-
-    unsent_reminders: int = 0
-    for appointment in appointments:
-        client: Client = appointment.client
-        message: str = appointment_remainder_message(
-            business=appointment.business.business_name,
-            date_=appointment.date,
-            time_=appointment.time.strftime("%H:%M"),
-            name=client.name.split()[0],
-            service=appointment.service.service
-        )
+    try:
+        start_date: date = datetime.strptime(request.args["start"], '%d-%m-%Y').date()
+        end_date: date = datetime.strptime(request.args.get("end", request.args["start"]), '%d-%m-%Y').date()
+        interval: int = int(request.args.get("interval", SLOT_INTERVAL_MINUTES))
+    except (KeyError, ValueError):
+        return jsonify({"message": "Invalid or missing start/end date (dd-mm-yyyy) or interval"}), 400
+
+    if end_date < start_date:
+        return jsonify({"message": "End date must be on or after the start date"}), 400
+
+    if (end_date - start_date).days >= MAX_SLOT_RANGE_DAYS:
+        return jsonify({"message": f"Date range can't be longer than {MAX_SLOT_RANGE_DAYS} days"}), 400
+
+    if interval < MIN_SLOT_INTERVAL_MINUTES:
+        return jsonify({"message": f"Interval must be at least {MIN_SLOT_INTERVAL_MINUTES} minutes"}), 400
+
+    service: Service = Service.query.get(service_id)
+    if not service:
+        return jsonify({"message": "Service not found"}), 404
+
+    business: Business = service.business
+    duration: timedelta = service_duration(service)
+    step: timedelta = timedelta(minutes=interval)
+    now: datetime = datetime.now()
+
+    staff_ids: list = [staff_id for staff_id, in db.session.query(Staff.id).filter(Staff.employer_id == business.id)]
+    schedules: dict = StaffSchedule.load_range(staff_ids, start_date, end_date)
+
+    slots: list = []
+    for offset in range((end_date - start_date).days + 1):
+        day: date = start_date + timedelta(days=offset)
+        opening, closing = business_hours(day, business)
+        if not (opening and closing):
+            continue
+
+        slot_start: datetime = datetime.combine(day, opening)
+        day_closing: datetime = datetime.combine(day, closing)
+        while slot_start + duration <= day_closing:
+            slot_end: datetime = slot_start + duration
+            if slot_start > now and check_business_closed(slot_start.time(), day, business):
+                free_staff: list = [
+                    staff_id for staff_id in staff_ids
+                    if not schedules[(staff_id, day)].is_busy(slot_start, slot_end)
+                ]
+                # Bookings without a staff member are allowed when the business has no staff
+                if free_staff or not staff_ids:
+                    slots.append({
+                        "date": day.strftime('%d-%m-%Y'),
+                        "time": slot_start.strftime('%H:%M'),
+                        "staff": free_staff
+                    })
+            slot_start += step
+
+    return jsonify({"message": "Success", "slots": slots}), 200
 
-        response = send_sms(phone=client.phone, message=message)
-        if response.status_code != 200:
-            unsent_reminders += 1
 
-    return jsonify({"message": f"Sent successfully", "unsuccessful": unsent_reminders}), 200
+@appointment_blueprint.route("/send_reminder", methods=["GET"])
+@verify_api_key
+def send_appointment_reminder():
+    """
+        Queue the reminder SMS for today's upcoming appointments.
+        Sent inline if the task queue can't be reached. Reminders already sent are skipped.
+        :return: 202, 200
+    """
+    try:
+        send_appointment_reminders.delay()
+        return jsonify({"message": "Reminders queued"}), 202
+    except Exception:
+        results: dict = send_appointment_reminders()
+        return jsonify({"message": "Sent successfully", "unsuccessful": results["failed"]}), 200
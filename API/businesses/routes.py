@@ -1,10 +1,10 @@
-from sqlalchemy import text
+from sqlalchemy import func, case
 from API.models import (
-    Business, Service, Rating, Review, BusinessCategory,
-    ServiceCategories
+    Business, Service, RatingSummary, Review, BusinessCategory,
+    ServiceCategories, Appointment, Sale, Expense, DailyBusinessMetric
 )
 from flask import Blueprint, jsonify, request
-from API import db, bcrypt
+from API import db, bcrypt, cache
 from flasgger import swag_from
 from API.lib.auth import (
     business_login_required,
@@ -13,18 +13,29 @@ from API.lib.auth import (
     decode_token,
     business_verification_required)
 from API.lib.slugify import slugify
-from API.lib.send_mail import business_account_activation_email, send_reset_email
+from API.lib.notification_tasks import queue_email
 from API.lib.data_serializer import (serialize_business,
                                      serialize_service,
                                      serialize_review, serialize_appointment, serialize_business_category,
                                      serialize_sale, serialize_expenses)
-from API.lib.rating_calculator import calculate_ratings
 from datetime import datetime, timedelta, timezone
-from API.helpers import update_profile_completion
+from API.helpers import update_profile_completion, invalidate_business_profile
+from API.lib.staff_schedule import hours_to_minutes
+from API.lib.query_options import review_counts, service_list_options
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
+from API.lib.geo import distance_order
+from API.lib.discovery_index import discovery_index
 from API.swaggerUI.endpoints_definitions.businesses_docs import ACCOUNT_ACTIVATION
 
 business_blueprint = Blueprint("businesses", __name__, url_prefix="/API/businesses")
 
+ANALYTICS_PAGE_SIZE = 50
+MAX_ANALYTICS_PAGE_SIZE = 200
+CATALOGUE_PAGE_SIZE = 20
+MAX_CATALOGUE_PAGE_SIZE = 100
+SEARCH_RADIUS_KM = 6
+MAX_SEARCH_RADIUS_KM = 50
+
 
 @business_blueprint.route("/signup", methods=["POST"])
 @verify_api_key
@@ -98,11 +109,11 @@ def business_signup():
         token = generate_token(expiry=token_expiry_time, username=business.slug)
 
         # Send mail
-        email_sent = business_account_activation_email(recipient=business.email, token=token, name=business.business_name)
+        queue_email("business_activation", recipient=business.email, token=token, name=business.business_name)
 
         return jsonify(
             {
-                "message": "Successful! Account activation link set to your email" if email_sent else "Activation email not sent, please try again",
+                "message": "Successful! Account activation link set to your email",
                 "business": serialize_business(business),
                 "activationToken": token
             }
@@ -137,9 +148,9 @@ def resend_verification_token():
 
         token_expiry_time = datetime.now(timezone.utc) + timedelta(minutes=30)
         token = generate_token(expiry=token_expiry_time, username=business.slug)
-        email_sent = business_account_activation_email(token=token, recipient=business.email, name=business.business_name)
+        queue_email("business_activation", token=token, recipient=business.email, name=business.business_name)
 
-        return jsonify({"message": "Account verification email has been sent to your inbox" if email_sent else  "Activation email not sent, please try again"}), 200
+        return jsonify({"message": "Account verification email has been sent to your inbox"}), 200
     
     except KeyError as e:
         return jsonify({"message": f"Invalid payload: '{e.args[0]}' key is required"}), 400
@@ -169,6 +180,8 @@ def activate_account(token):
         return jsonify({"message": "Account already active"}), 400
     business.verified = True
     db.session.commit()
+    invalidate_business_profile(business.slug)
+    discovery_index.refresh(business.id)
     return jsonify({"message": "Success", "username": business.slug}), 200
 
 
@@ -236,9 +249,9 @@ def request_password_reset():
 
     token_expiry_time = datetime.now(timezone.utc) + timedelta(minutes=30)
     token = generate_token(expiry=token_expiry_time, username=business.slug)
-    email_sent = send_reset_email(recipient=business.email, token=token, name=business.business_name)
+    queue_email("business_password_reset", recipient=business.email, token=token, name=business.business_name)
 
-    return jsonify({"message": "Reset link has been sent to your email" if email_sent else "Password reset email not sent. Please try again"}), 200
+    return jsonify({"message": "Reset link has been sent to your email"}), 200
 
 
 @business_blueprint.route("/reset-password/<string:reset_token>", methods=["PUT"])
@@ -285,10 +298,10 @@ def resend_account_activation_token(business):
 
         token_expiry_time = datetime.now(timezone.utc) + timedelta(minutes=30)
         token = generate_token(expiry=token_expiry_time, username=business.slug)
-        email_sent = business_account_activation_email(token=token, recipient=business.email, name=business.business_name)
+        queue_email("business_activation", token=token, recipient=business.email, name=business.business_name)
 
         return jsonify({
-            "message": "Account verification email has been sent to your inbox" if email_sent else "Account verification email not sent. Please try again",
+            "message": "Account verification email has been sent to your inbox",
             "activationToken": token
         }), 200
     except Exception as e:
@@ -333,6 +346,7 @@ def update_profile(business):
 
         token_expiry_time = datetime.now(timezone.utc) + timedelta(days=1)
         token = generate_token(expiry=token_expiry_time, username=slug)
+        old_slug: str = business.slug
 
         business.business_name = name
         business.email = email
@@ -345,6 +359,8 @@ def update_profile(business):
         business.longitude = longitude
         business.place_id = place_id
         db.session.commit()
+        if old_slug != slug:
+            invalidate_business_profile(old_slug)
         update_profile_completion(business)
         return jsonify({"message": "Update Successful", "business": serialize_business(business), "authToken": token}), 200
 
@@ -410,6 +426,7 @@ def assign_services(business: Business):
                 price=service["price"],
                 description=service["description"].strip(),
                 estimated_service_time=parsedestimatedtime,
+                duration_minutes=hours_to_minutes(parsedestimatedtime),
                 service_category=service["category"],
                 business_id=business.id
             )
@@ -458,19 +475,24 @@ def remove_service(business):
 @verify_api_key
 def fetch_all_businesses():
     """
-        Fetch all businesses
-        :return: 200
+        Fetch listed businesses, one page at a time
+        :return: 200, 400
     """
+    cursor, limit = page_args()
     try:
-        businesses = Business.query.filter_by(active=True, verified=True, profile_completed=True).all()
+        query = Business.query.filter_by(active=True, verified=True, profile_completed=True)
+        businesses, next_cursor = keyset_paginate(query, (Business.id,), cursor, limit, descending=False)
         if not businesses:
             return jsonify("Businesses not")
+        reviews_per_business = review_counts([business.id for business in businesses])
         all_businesses = []
         for business in businesses:
             business_data = serialize_business(business)
-            business_data["reviews"] = len(business.reviews.all())
+            business_data["reviews"] = reviews_per_business.get(business.id, 0)
             all_businesses.append(business_data)
-        return jsonify({"message": "Success", "businesses": all_businesses}), 200
+        return jsonify({"message": "Success", "businesses": all_businesses, "nextCursor": next_cursor}), 200
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
     except Exception as e:
         return jsonify(f"message: Failed to fetch businesses due to an unexpected issue: {e}"), 400
 
@@ -479,123 +501,162 @@ def fetch_all_businesses():
 @verify_api_key
 def fetch_business(slug):
     """
-        Fetch business by a give ID
+        Fetch business by a give ID. Served from the cache until the business's profile changes
         :param slug:
         :return: 404, 200
     """
     try:
-        business = Business.query.filter_by(slug=slug, active=True, verified=True, profile_completed=True).first()
-
-        if not business:
+        profile = cache.fetch(f"business:{slug}", lambda: business_profile(slug))
+        if not profile:
             return jsonify({"message": "Business doesn't exist"}), 404
 
-        ratings = Rating.query.filter_by(business_id=business.id).all()
-        if ratings:
-            rating_score, breakdown = calculate_ratings(ratings=ratings, breakdown=True)
-        else:
-            breakdown = None
-            rating_score = None
-        reviews = Review.query.filter_by(business_id=business.id)
-        business_data = dict(
-            business_name=business.business_name,
-            category=business.category.category_name,
-            id=business.id,
-            phone=business.phone,
-            description=business.description,
-            imageUrl=business.profile_img,
-            city=business.city,
-            email=business.email,
-            rating=business.rating,
-            latitude=business.latitude,
-            longitude=business.longitude,
-            formatted_address=business.formatted_address,
-            placeId=business.place_id,
-            profile_completed=business.profile_completed
-        )
-
-        all_services = []
-        for service in business.services.all():
-            service_info = serialize_service(service)
-            all_services.append(service_info)
-
-        all_reviews = []
-        for review in reviews:
-            all_reviews.append(serialize_review(review))
-
-        return jsonify(
-            {
-                "business": business_data,
-                "services": all_services,
-                "ratingsAverage": rating_score,
-                "ratingsBreakdown": breakdown,
-                "reviews": all_reviews,
-                "gallery": []
-            }
-        ), 200
+        return jsonify(profile), 200
     except Exception as e:
         return jsonify({"message": f"Failed to fetch business due to an unexpected issue: {str(e)}"}), 400
 
 
+def business_profile(slug):
+    """
+        Build the public profile of a business
+        :param slug: Business slug
+        :return: Profile data, None if the business isn't listed
+    """
+    business = Business.query.filter_by(slug=slug, active=True, verified=True, profile_completed=True).first()
+    if not business:
+        return None
+
+    summary = RatingSummary.query.get(business.id)
+    if summary and summary.ratings_count:
+        rating_score, breakdown = summary.average, summary.breakdown
+    else:
+        breakdown = None
+        rating_score = None
+    reviews = Review.query.filter_by(business_id=business.id)
+    business_data = dict(
+        business_name=business.business_name,
+        category=business.category.category_name,
+        id=business.id,
+        phone=business.phone,
+        description=business.description,
+        imageUrl=business.profile_img,
+        city=business.city,
+        email=business.email,
+        rating=business.rating,
+        latitude=business.latitude,
+        longitude=business.longitude,
+        formatted_address=business.formatted_address,
+        placeId=business.place_id,
+        profile_completed=business.profile_completed
+    )
+
+    all_services = []
+    for service in business.services.all():
+        service_info = serialize_service(service)
+        all_services.append(service_info)
+
+    all_reviews = []
+    for review in reviews:
+        all_reviews.append(serialize_review(review))
+
+    return {
+        "business": business_data,
+        "services": all_services,
+        "ratingsAverage": rating_score,
+        "ratingsBreakdown": breakdown,
+        "reviews": all_reviews,
+        "gallery": []
+    }
+
+
 @business_blueprint.route("/analysis", methods=["GET"])
 @business_login_required
 @business_verification_required
 def get_business_analytics(business):
     """
         Business analysis for the Business Dashboard Page
+        Totals are read from the daily metrics rollup. The lifetime lists (appointments, sales, expenses) are only
+        returned when requested with ?lifetime=true and are paginated with ?page=&per_page=
         :param business: Logged in Business
         :return: 200
     """
-    # Today's Appointments & all appointments
     try:
         today = datetime.today().date()
-        current_month = today.month
-        current_year = today.year
-        appointments = business.appointments.filter_by(cancelled=False).all()
+        month_start = today.replace(day=1)
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+
+        # Today's Appointments
+        todays_appointments = db.session.query(Appointment, Service.service) \
+            .outerjoin(Service, Appointment.service_id == Service.id) \
+            .filter(
+                Appointment.business_id == business.id,
+                Appointment.date == today,
+                ~Appointment.cancelled,
+                Appointment.completed.isnot(True)
+            ).all()
         today_appointments = []
-        all_appointments = []
-        for appointment in appointments:
-            all_appointments.append(serialize_appointment(appointment))
-            if appointment.date == today and not appointment.completed:
-                appointment_serialized = serialize_appointment(appointment)
-                appointment_serialized["service"] = appointment.service.service
-                today_appointments.append(appointment_serialized)
-
-        # Today's Revenue & current month Revenue
-        sales = business.sales.all()
-        today_sales = 0
-        current_month_sales = 0
-        lifetime_sales = []
-        for sale in sales:
-            service = sale.service
-            sale_serialized = serialize_sale(sale)
-            sale_serialized["price"] = service.price
-            lifetime_sales.append(sale_serialized)
-            if sale.date_created.date().month == current_month and sale.date_created.date().year == current_year:
-                if sale.date_created.date() == today:
-                    today_sales += service.price
-                current_month_sales += service.price
-
-        # Expenses
-        expenses = business.expenses.all()
-        current_month_expenses = 0
-        lifetime_expenses = []
-        for expense in expenses:
-            lifetime_expenses.append(serialize_expenses(expense))
-            if expense.created_at.date().month == current_month and expense.created_at.date().year == current_year:
-                current_month_expenses += expense.amount
+        for appointment, service_name in todays_appointments:
+            appointment_serialized = serialize_appointment(appointment)
+            appointment_serialized["service"] = service_name
+            today_appointments.append(appointment_serialized)
+
+        # Today's Revenue, current month Revenue & Expenses from the daily rollup
+        today_sales, current_month_sales, current_month_expenses = db.session.query(
+            func.coalesce(func.sum(case((DailyBusinessMetric.day == today, DailyBusinessMetric.revenue), else_=0)), 0),
+            func.coalesce(func.sum(DailyBusinessMetric.revenue), 0),
+            func.coalesce(func.sum(DailyBusinessMetric.expense_total), 0)
+        ) \
+            .filter(
+                DailyBusinessMetric.business_id == business.id,
+                DailyBusinessMetric.day >= month_start,
+                DailyBusinessMetric.day < next_month_start
+            ).one()
+
+        analytics = {
+            "message": "Success",
+            "today_appointments": today_appointments,
+            "today_revenue": int(today_sales),
+            "current_month_revenue": int(current_month_sales),
+            "current_month_expenses": int(current_month_expenses)
+        }
 
-        return jsonify(
-            {
-                "message": "Success",
-                "all_appointments": all_appointments,
-                "today_appointments": today_appointments,
-                "today_revenue": today_sales,
-                "current_month_revenue": current_month_sales,
-                "lifetime_sales": lifetime_sales,
-                "current_month_expenses": current_month_expenses,
-                "lifetime_expenses": lifetime_expenses
+        if request.args.get("lifetime", "").lower() == "true":
+            page = request.args.get("page", 1, type=int)
+            per_page = min(request.args.get("per_page", ANALYTICS_PAGE_SIZE, type=int), MAX_ANALYTICS_PAGE_SIZE)
+
+            appointments_page = Appointment.query \
+                .filter(Appointment.business_id == business.id, ~Appointment.cancelled) \
+                .order_by(Appointment.date.desc(), Appointment.id.desc()) \
+                .paginate(page=page, per_page=per_page, error_out=False)
+
+            sales_page = Sale.query \
+                .filter(Sale.business_id == business.id) \
+                .order_by(Sale.date_created.desc(), Sale.id.desc()) \
+                .paginate(page=page, per_page=per_page, error_out=False)
+
+            expenses_page = Expense.query \
+                .filter(Expense.business_id == business.id) \
+                .order_by(Expense.created_at.desc(), Expense.id.desc()) \
+                .paginate(page=page, per_page=per_page, error_out=False)
+
+            lifetime_sales = []
+            for sale in sales_page.items:
+                sale_serialized = serialize_sale(sale)
+                # The price recorded with the sale, as the rollup totals use
+                sale_serialized["price"] = sale.price
+                lifetime_sales.append(sale_serialized)
+
+            analytics["all_appointments"] = [serialize_appointment(appointment) for appointment in appointments_page.items]
+            analytics["lifetime_sales"] = lifetime_sales
+            analytics["lifetime_expenses"] = [serialize_expenses(expense) for expense in expenses_page.items]
+            analytics["pagination"] = {
+                "page": page,
+                "per_page": per_page,
+                "appointments_total": appointments_page.total,
+                "sales_total": sales_page.total,
+                "expenses_total": expenses_page.total
             }
-        ), 200
+
+        return jsonify(analytics), 200
     except Exception:
         return jsonify({"message": "Failed to fetch business analytics due to an unexpected issue"}), 400
 
@@ -604,27 +665,60 @@ def get_business_analytics(business):
 @verify_api_key
 def service_businesses(service_id):
     """
-        Get business by service. Businesses offering a certain service
+        Get business by service. Businesses offering a certain service, each listed once.
+        Optional: ?sort=rating or ?sort=distance&lat=&lng=, and ?page=&per_page= to paginate
         :param service_id: ID of the service
-        :return: 404, 200
+        :return: 400, 404, 200
     """
     try:
         service_category = ServiceCategories.query.get(service_id)
         if not service_category:
             return jsonify({"message": "Service doesn't exist"}), 404
 
+        sort: str = request.args.get("sort", "")
+        offering_businesses = db.session.query(Service.business_id).filter(Service.service_category == service_id)
+        query = db.session.query(
+            Business, BusinessCategory.category_name, RatingSummary.ratings_total, RatingSummary.ratings_count
+        ) \
+            .outerjoin(BusinessCategory, Business.category_id == BusinessCategory.id) \
+            .outerjoin(RatingSummary, RatingSummary.business_id == Business.id) \
+            .filter(Business.id.in_(offering_businesses))
+
+        if sort == "rating":
+            average = RatingSummary.ratings_total * 1.0 / RatingSummary.ratings_count
+            query = query.order_by(average.desc().nulls_last(), Business.id)
+        elif sort == "distance":
+            try:
+                latitude: float = float(request.args["lat"])
+                longitude: float = float(request.args["lng"])
+            except (KeyError, ValueError):
+                return jsonify({"message": "lat and lng are required to sort by distance"}), 400
+            query = query.filter(Business.latitude.isnot(None), Business.longitude.isnot(None)) \
+                .order_by(distance_order(latitude, longitude), Business.id)
+        elif sort:
+            return jsonify({"message": "sort must be rating or distance"}), 400
+        else:
+            query = query.order_by(Business.id)
+
+        response: dict = {}
+        if "page" in request.args:
+            page: int = request.args.get("page", 1, type=int)
+            per_page: int = min(request.args.get("per_page", CATALOGUE_PAGE_SIZE, type=int), MAX_CATALOGUE_PAGE_SIZE)
+            results = query.paginate(page=page, per_page=per_page, error_out=False)
+            response["pagination"] = {"page": page, "per_page": per_page, "total": results.total}
+            rows = results.items
+        else:
+            rows = query.all()
+
         all_businesses = []
-        for service in service_category.services.all():
-            business = service.business
-            ratings = Rating.query.filter_by(business_id=business.id).all()
-            rating_score = calculate_ratings(ratings=ratings, breakdown=False)
+        for business, category_name, ratings_total, ratings_count in rows:
             business_info = dict(
                 name=business.business_name,
-                categories=business.category.category_name,
+                categories=category_name,
                 city=business.city,
                 id=business.id,
                 phone=business.phone,
-                ratingsAverage=rating_score,
+                ratingsAverage=round(ratings_total / ratings_count) if ratings_count else None,
                 latitude=business.latitude,
                 longitude=business.longitude,
                 place_id=business.place_id,
@@ -632,7 +726,8 @@ def service_businesses(service_id):
             )
             all_businesses.append(business_info)
 
-        return jsonify({"businesses": all_businesses}), 200
+        response["businesses"] = all_businesses
+        return jsonify(response), 200
     except Exception:
         return jsonify({"message": "Failed to fetch businesses due to an unexpected issue"}), 400
 
@@ -785,7 +880,7 @@ def fetch_business_services(slug):
         if not business:
             return jsonify({"message": "Business doesn't exist"}), 404
 
-        services: list = business.services.all()
+        services: list = business.services.options(*service_list_options()).all()
 
         all_services: list = []
         for service in services:
@@ -811,73 +906,47 @@ def search_businesses_by_location_and_service():
             "service": "Service Name",
             "latitude": 0.0,
             "longitude": 0.0,
+            "radius": 6 (Optional. Kilometres)
         }
-        :return: 200
+        :return: 400, 404, 200
     """
     payload = request.get_json()
     service_name = payload.get("service")
     latitude = payload.get("latitude")
     longitude = payload.get("longitude")
-    radius = 6 * 1000
 
     if not service_name or latitude is None or longitude is None:
         return jsonify({"message": "'service', 'latitude', and 'longitude' are required."}), 400
 
     try:
-        # Fetch the service
-        service = Service.query.filter_by(service=service_name).first()
-        if not service:
-            return jsonify({"message": "Service not found"}), 404
+        latitude = float(latitude)
+        longitude = float(longitude)
+        radius: float = float(payload.get("radius", SEARCH_RADIUS_KM))
+    except (TypeError, ValueError):
+        return jsonify({"message": "'latitude', 'longitude' and 'radius' must be numbers"}), 400
 
-        query = text(f"""
-            SELECT b.id, b.name, b.latitude, b.longitude,
-                   (6371 * 
-                    ACOS(
-                        COS(RADIANS(:latitude)) * COS(RADIANS(b.latitude)) *
-                        COS(RADIANS(b.longitude) - RADIANS(:longitude)) +
-                        SIN(RADIANS(:latitude)) * SIN(RADIANS(b.latitude))
-                    )) AS distance
-            FROM businesses b
-            JOIN service_businesses sb ON b.id = sb.business_id
-            WHERE sb.service_id = :service_id
-              AND b.active = TRUE
-              AND b.verified = TRUE
-              AND b.profile_completed = TRUE
-            HAVING distance <= :radius
-            ORDER BY distance
-        """)
-
-        # Execute query
-        result = db.session.execute(
-            query, {
-                "latitude": latitude,
-                "longitude": longitude,
-                "radius": radius / 1000,
-                "service_id": service.id
-            }
-        )
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or not 0 < radius <= MAX_SEARCH_RADIUS_KM:
+        return jsonify({"message": f"Invalid location or radius. Maximum radius is {MAX_SEARCH_RADIUS_KM}km"}), 400
+
+    try:
+        # Answered from the in-process discovery index: geohash cells around the point, exact distance per record
+        businesses: list = []
+        for record, distance, services in discovery_index.nearby(latitude, longitude, radius, service_name=service_name):
+            businesses.append({
+                "id": record.id,
+                "name": record.name,
+                "slug": record.slug,
+                "latitude": record.latitude,
+                "longitude": record.longitude,
+                "distance": round(distance, 2),
+                "reviews": record.reviews,
+                "services": [{"id": service.id, "service": service.name, "price": service.price} for service in services]
+            })
 
-        # Process results
-        businesses = result.fetchall()
         if not businesses:
             return jsonify({"message": "No businesses found for the specified service and location"}), 404
 
-        # Serialize businesses
-        all_businesses = []
-        for business in businesses:
-            business_data = {
-                "id": business.id,
-                "name": business.business_name,
-                "latitude": business.latitude,
-                "longitude": business.longitude,
-            }
-
-            # Add additional info
-            business_obj = Business.query.get(business.id)
-            business_data["reviews"] = len(business_obj.reviews.all())
-            all_businesses.append(business_data)
-
-        return jsonify({"businesses": all_businesses}), 200
+        return jsonify({"businesses": businesses}), 200
 
     except Exception as e:
-        return jsonify({"message": f"An error occurred: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"message": f"An error occurred: {str(e)}"}), 500
@@ -7,7 +7,9 @@ from API.lib.utils import save_response_image
 from API.lib.auth import verify_api_key, generate_token, decode_token, client_login_required, business_login_required
 from API import bcrypt, db
 from API.lib.OTP import generate_otp
-from API.lib.send_mail import send_otp, sent_client_reset_token
+from API.lib.query_options import appointment_client_options
+from API.lib.notification_tasks import queue_email
+from API.lib.notification_router import normalize_channel
 from datetime import datetime, timedelta, date, UTC, timezone
 import json
 
@@ -48,7 +50,7 @@ def client_signup():
             client.otp_expiration = datetime.now() + timedelta(minutes=30)
             db.session.commit()
 
-            send_otp(recipient=email, otp=otp, name=name)
+            queue_email("otp", recipient=email, otp=otp, name=name)
 
         client = Client(
             name=name,
@@ -60,8 +62,8 @@ def client_signup():
         )
         db.session.add(client)
         db.session.commit()
-        otp_sent = send_otp(recipient=email, otp=otp, name=name)
-        return jsonify({"message": "Signup Success. An OTP has been sent to your email.", "email": email if otp_sent else "Signup successful. Please try again",
+        queue_email("otp", recipient=email, otp=otp, name=name)
+        return jsonify({"message": "Signup Success. An OTP has been sent to your email.", "email": email,
                         "Client": serialize_client(client)
                         }), 200
     except KeyError as e:
@@ -195,13 +197,14 @@ def request_password_reset():
 
     token_expiry_time: datetime = datetime.utcnow() + timedelta(minutes=30)
     token: str = generate_token(expiry=token_expiry_time, username=client.email)
-    token_sent = sent_client_reset_token(
+    queue_email(
+        "client_password_reset",
         recipient=client.email,
         url=f"https://www.pamba.africa/client-reset/{token}",
         name=client.name
     )
 
-    return jsonify({"message": "Token sent to your email" if token_sent else "Failed to send token to email. Please check your email after a while"}), 200
+    return jsonify({"message": "Token sent to your email"}), 200
 
 
 @clients_blueprint.route("/reset-password/<string:token>", methods=["POST"])
@@ -267,8 +270,12 @@ def update_profile(client):
     payload: dict = json.loads(request.form.get("payload"))
     email: str = payload.get("email").strip().lower()
     phone: str = payload.get("phone").strip()
+    notification_channel: str = payload.get("notificationChannel", "")
     files = request.files
 
+    if notification_channel and not normalize_channel(notification_channel):
+        return jsonify({"message": "Notification channel must be email, sms or whatsapp"}), 400
+
     if "image" not in files:
         return jsonify({"message": "No image uploaded"}), 400
 
@@ -291,6 +298,7 @@ def update_profile(client):
     client.phone = phone
     client.dob = dob
     client.profile_image = image_name
+    client.notification_channel = normalize_channel(notification_channel) or client.notification_channel
     db.session.commit()
 
     return jsonify({"message": "Update Successful", "client": serialize_client(client)}), 200
@@ -318,9 +326,9 @@ def resend_verification_otp():
         db.session.commit()
 
         # Send Email
-        otp_sent = send_otp(recipient=email, otp=otp, name=client.name)
+        queue_email("otp", recipient=email, otp=otp, name=client.name)
         masked_email = f"{email[:3]}*****{email.split('@')[-1]}"
-        return jsonify({"message": f"OTP sent to: {masked_email}" if otp_sent else "Failure sending the OTP. Please try again"}), 200
+        return jsonify({"message": f"OTP sent to: {masked_email}"}), 200
     except Exception:
         return jsonify({"message":"Failed to send OTP"}), 400
 
@@ -339,7 +347,8 @@ def fetch_business_clients(business):
     year: int = 2024
     yearly_appointments: dict = {}
 
-    appointments = business.appointments.filter_by(cancelled=False).order_by(Appointment.date.desc()).all()
+    appointments = business.appointments.options(*appointment_client_options()) \
+        .filter_by(cancelled=False).order_by(Appointment.date.desc()).all()
     for appointment in appointments:
         all_appointments.append(serialize_appointment(appointment))
         client = appointment.client
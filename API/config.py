@@ -6,13 +6,22 @@ class Config:
     load_dotenv()
     SECRET_KEY = os.getenv('SECRET')
     SQLALCHEMY_DATABASE_URI = os.getenv('PAMBA_DB')
-    MAIL_SERVER = 'smtp.googlemail.com'
-    MAIL_PORT = 587
+    # Overridable so a local SMTP stand-in can be used in development
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.googlemail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
     MAIL_USE_TLS = True
     MAIL_USERNAME = os.getenv('EMAIL_ADDRESS')
     MAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
+    MAIL_POOL_SIZE = 2
+    MAIL_POOL_IDLE_SECONDS = 60
 
 
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_DEFAULT_TTL = 24 * 60 * 60
+    # Without Redis, invalidations only reach the worker that made them; this bounds staleness elsewhere
+    CACHE_LOCAL_TTL = 60
+
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
     CELERY_TASK_SERIALIZER = 'json'
@@ -21,8 +30,17 @@ class Config:
     CELERY_TIMEZONE = 'Africa/Nairobi'
     CELERY_ENABLE_UTC = False
     CELERY_BEAT_SCHEDULE = {
-        'resend-failed-notifications-every-30-minutes': {
+        # Cheap when nothing is due; each row's next_attempt_at sets its actual backoff
+        'resend-failed-notifications-every-minute': {
             'task': 'CRON.celery_tasks.resend_failed_notifications',
-            'schedule': crontab(minute='*/30'),
+            'schedule': crontab(minute='*'),
+        },
+        'send-appointment-reminders-every-morning': {
+            'task': 'API.lib.notification_tasks.send_appointment_reminders',
+            'schedule': crontab(hour=7, minute=0),
+        },
+        'purge-notification-dispatches-every-night': {
+            'task': 'API.lib.notification_tasks.purge_notification_dispatches',
+            'schedule': crontab(hour=3, minute=0),
         },
     }
\ No newline at end of file
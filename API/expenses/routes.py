@@ -3,6 +3,9 @@ from API import db
 from API.lib.auth import business_login_required, business_verification_required
 from API.lib.data_serializer import serialize_expenses
 from API.models import Expense, ExpenseAccount
+from API.lib.metrics import track_expense
+from API.lib.query_options import expense_list_options
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 from datetime import datetime
 
 expenses_blueprint = Blueprint("expenses", __name__, url_prefix="/API/expenses")
@@ -39,6 +42,8 @@ def record_expenses(business):
     )
 
     db.session.add(new_expense)
+    db.session.flush()
+    track_expense(new_expense)
     db.session.commit()
 
     return jsonify({"message": "Expense Recorded", "expense": serialize_expenses(new_expense)}), 201
@@ -59,6 +64,7 @@ def delete_expense(business, expense_id):
     if not expense:
         return jsonify({"message": "Expense not found"}), 404
 
+    track_expense(expense, sign=-1)
     db.session.delete(expense)
     db.session.commit()
 
@@ -85,11 +91,13 @@ def update_expense(business, expense_id):
     if not expense_record:
         return jsonify({"message": "Expense record not found"}), 404
 
+    track_expense(expense_record, sign=-1)
     expense_record.expense = expense
     expense_record.amount = amount
     expense_record.description = description
     expense_record.expense_account = account_id
     expense_record.modified_at = datetime.utcnow()
+    track_expense(expense_record)
     db.session.commit()
 
     return jsonify({"message": "Update Successful", "updated": serialize_expenses(expense_record)}), 200
@@ -100,17 +108,25 @@ def update_expense(business, expense_id):
 @business_verification_required
 def fetch_business_expenses(business):
     """
-        Fetch Expenses for the current logged in business.
+        Fetch Expenses for the current logged in business, newest first, one page at a time.
         :param business:
         :return: 400, 200
     """
+    cursor, limit = page_args()
+    try:
+        expenses, next_cursor = keyset_paginate(
+            business.expenses.options(*expense_list_options()), (Expense.created_at, Expense.id), cursor, limit
+        )
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
+
     all_expenses = []
-    for expense in business.expenses.order_by(Expense.created_at.desc()).all():
+    for expense in expenses:
         serialized_expense = serialize_expenses(expense)
         serialized_expense["category"] = expense.account.account_name
         all_expenses.append(serialized_expense)
 
-    return jsonify({"expenses": all_expenses}), 200
+    return jsonify({"expenses": all_expenses, "nextCursor": next_cursor}), 200
 
 
 @expenses_blueprint.route("/expense/<int:expense_id>", methods=["GET"])
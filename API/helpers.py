@@ -1,12 +1,16 @@
 import logging
 from API.models import Service, ExpenseAccount
-from API import db
+from API import db, cache
+from API.lib.discovery_index import discovery_index
 from sqlalchemy.orm import joinedload
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Version of the /API/services/all catalogue, bumped with every business profile change
+CATALOGUE = "catalogue"
+
 def update_profile_completion(business):
     """
     Check and update the profile completion status of a business.
@@ -32,4 +36,17 @@ def update_profile_completion(business):
         db.session.commit() 
     except Exception as e:
         logger.error(f"Failed to update profile completion for business ID: {business.id}. Error: {str(e)}")
-        db.session.rollback()
\ No newline at end of file
+        db.session.rollback()
+    invalidate_business_profile(business.slug)
+    discovery_index.refresh(business.id)
+
+
+def invalidate_business_profile(slug):
+    """
+    Drop the cached public profile of a business and move the service catalogue to a new version.
+    Call after committing any change the profile shows.
+    :param slug: Business slug
+    :return: None
+    """
+    cache.bump(f"business:{slug}")
+    cache.bump(CATALOGUE)
\ No newline at end of file
@@ -3,6 +3,7 @@ from flask import jsonify, Blueprint, request
 from API.models import Business, Inventory
 from API.lib.auth import business_login_required, business_verification_required
 from API.lib.data_serializer import serialize_inventory
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 from datetime import datetime
 
 inventory_blueprint = Blueprint("inventory", __name__, url_prefix="/API/inventory")
@@ -88,15 +89,20 @@ def update_inventory_status(business, inventory_id):
 @business_login_required
 def fetch_all_records(business):
     """
-        Fetch all inventory records for the business
+        Fetch the business's inventory records, newest first, one page at a time
         :param business:
-        :return: 200
+        :return: 200, 400
     """
+    cursor, limit = page_args()
+    query = Inventory.query.filter_by(business_id=business.id)
+    try:
+        inventory_records, next_cursor = keyset_paginate(query, (Inventory.id,), cursor, limit)
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
 
-    inventory_records = Inventory.query.filter_by(business_id=business.id).all()
     inventory = []
 
     for record in inventory_records:
         inventory.append(serialize_inventory(record))
 
-    return jsonify({"inventory": inventory}), 200
+    return jsonify({"inventory": inventory, "nextCursor": next_cursor}), 200
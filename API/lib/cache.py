@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+
+class LRUBackend:
+    """
+        In-process cache holding up to max_entries values, evicting the least recently used.
+        Version counters are kept apart from the values so eviction never resets them.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries: int = max_entries
+        self._values: OrderedDict = OrderedDict()
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        value, expires_at = self._values[key]
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            raise KeyError(key)
+        self._values.move_to_end(key)
+        return value
+
+    def get(self, key: str):
+        with self._lock:
+            try:
+                return self._live(key)
+            except KeyError:
+                return None
+
+    def _store(self, key: str, value, ttl: Optional[int]) -> None:
+        """Callers hold the lock"""
+        self._values[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+
+    def set(self, key: str, value, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value, ttl: Optional[int] = None) -> bool:
+        with self._lock:
+            try:
+                self._live(key)
+                return False
+            except KeyError:
+                self._store(key, value, ttl)
+                return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def get_counter(self, key: str) -> Optional[int]:
+        with self._lock:
+            return self._counters.get(key)
+
+    def init_counter(self, key: str, value: int) -> int:
+        with self._lock:
+            return self._counters.setdefault(key, value)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+def _dumps(value) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RedisBackend:
+    """
+        Cache shared by every worker, stored in Redis. Values are stored as JSON.
+        :param client: redis.Redis client, or any object with the same get/set/delete/incr methods
+    """
+
+    def __init__(self, client, prefix: str = "pamba:"):
+        self.client = client
+        self.prefix: str = prefix
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else orjson.loads(value)
+
+    def set(self, key: str, value, ttl: Optional[int] = None) -> None:
+        self.client.set(self.prefix + key, _dumps(value), ex=ttl)
+
+    def add(self, key: str, value, ttl: Optional[int] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, _dumps(value), ex=ttl, nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def get_counter(self, key: str) -> Optional[int]:
+        value = self.client.get(self.prefix + key)
+        return None if value is None else int(value)
+
+    def init_counter(self, key: str, value: int) -> int:
+        self.client.set(self.prefix + key, value, nx=True)
+        return int(self.client.get(self.prefix + key))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+
+class Cache:
+    """
+        Flask extension wrapping the configured backend.
+        CACHE_REDIS_URL selects the Redis backend, shared by every worker, so a version bump invalidates everywhere.
+        Otherwise values are cached per process, where a bump only reaches the worker that made it;
+        entries then live at most CACHE_LOCAL_TTL so other workers catch up within that.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl: Optional[int] = None
+        self.shared: bool = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        redis_url: Optional[str] = app.config.get("CACHE_REDIS_URL")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL")
+        if redis_url:
+            import redis
+            self.backend = RedisBackend(redis.Redis.from_url(redis_url))
+            self.shared = True
+        else:
+            self.backend = LRUBackend(app.config.get("CACHE_MAX_ENTRIES", 1024))
+            self.default_ttl = min(filter(None, (self.default_ttl, app.config.get("CACHE_LOCAL_TTL", 60))))
+            self.shared = False
+        app.extensions["cache"] = self
+
+    def get(self, key: str):
+        return self.backend.get(key)
+
+    def set(self, key: str, value, ttl: Optional[int] = None) -> None:
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def add(self, key: str, value, ttl: Optional[int] = None) -> bool:
+        """Set the key only if it isn't cached yet. Returns True if it was set"""
+        return self.backend.add(key, value, ttl or self.default_ttl)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def version(self, name: str) -> int:
+        """
+            Current version of a cached resource
+            :param name: Resource name e.g. business:<slug>
+            :return: Version number
+        """
+        version: Optional[int] = self.backend.get_counter(f"{name}:version")
+        if version is None:
+            # Start from the clock so a counter lost to eviction never reuses an old version
+            version = self.backend.init_counter(f"{name}:version", time.time_ns())
+        return version
+
+    def bump(self, name: str) -> None:
+        """
+            Invalidate every cached value of a resource by moving it to a new version
+            :param name: Resource name e.g. business:<slug>
+            :return: None
+        """
+        if self.backend.get_counter(f"{name}:version") is None:
+            self.backend.init_counter(f"{name}:version", time.time_ns())
+        self.backend.incr(f"{name}:version")
+
+    def fetch(self, name: str, loader):
+        """
+            Read-through lookup of a versioned resource
+            :param name: Resource name e.g. business:<slug>
+            :param loader: Called on a miss. Returns the value to cache, or None to skip caching
+            :return: Cached or freshly loaded value
+        """
+        key: str = f"{name}:{self.version(name)}"
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
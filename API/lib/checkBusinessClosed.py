@@ -14,3 +14,15 @@ def check_business_closed(time, date, business):
         if business.weekday_closing > time > business.weekday_opening:
             return True
     return False
+
+
+def business_hours(date, business):
+    """
+        Opening and closing times of the business on a given date
+        :param date: Date being checked
+        :param business: The business
+        :return: (opening, closing). Either may be None if the business hours are not set
+    """
+    if date.weekday() >= 5:  # is weekend
+        return business.weekend_opening, business.weekend_closing
+    return business.weekday_opening, business.weekday_closing
@@ -1,4 +1,57 @@
-from flask_restful import fields, marshal
+# Field converters. Each matches the flask_restful field it replaces so responses stay identical:
+# missing/None values become 0 for integers and None (null) for everything else.
+# date, time and datetime values are left to the app's JSON provider, which encodes them as ISO 8601.
+
+
+def integer(value):
+    return 0 if value is None else int(value)
+
+
+def string(value):
+    return None if value is None else str(value)
+
+
+def floating(value):
+    return None if value is None else float(value)
+
+
+def boolean(value):
+    return None if value is None else bool(value)
+
+
+def iso8601(value):
+    return value
+
+
+def compile_fields(field_spec: dict) -> tuple:
+    """
+        Build a serializer's field list once, at import time
+        :param field_spec: {key: converter}
+        :return: ((key, converter), ...)
+    """
+    return tuple(field_spec.items())
+
+
+def serialize(obj, compiled_fields: tuple) -> dict:
+    """
+        Serialize an object with fields built by compile_fields
+        :param obj: Query object
+        :param compiled_fields: Output of compile_fields
+        :return: dict of the serialized fields
+    """
+    return {key: converter(getattr(obj, key, None)) for key, converter in compiled_fields}
+
+
+CLIENT_FIELDS = compile_fields({
+    "id": integer,
+    "name": string,
+    "email": string,
+    "phone": string,
+    "verified": boolean,
+    "dob": iso8601,
+    "profile_image": string,
+    "notification_channel": string
+})
 
 
 def serialize_client(client):
@@ -7,18 +60,32 @@ def serialize_client(client):
         :param client: client object
         :return: client's json data
     """
-
-    client_fields = {
-        "id": fields.Integer,
-        "name": fields.String,
-        "email": fields.String,
-        "phone": fields.String,
-        "verified": fields.Boolean,
-        "dob": fields.DateTime(dt_format='iso8601'),
-        "profile_image": fields.String
-    }
-
-    return marshal(client, client_fields)
+    return serialize(client, CLIENT_FIELDS)
+
+
+BUSINESS_FIELDS = compile_fields({
+    "id": integer,
+    "business_name": string,
+    "slug": string,
+    "email": string,
+    "phone": string,
+    "city": string,
+    "description": string,
+    "place_id": string,
+    "formatted_address": string,
+    "latitude": floating,
+    "longitude": floating,
+    "active": boolean,
+    "verified": boolean,
+    "join_date": iso8601,
+    "rating": string,
+    "profile_img": string,
+    "weekday_opening": string,
+    "weekday_closing": string,
+    "weekend_opening": string,
+    "weekend_closing": string,
+    "profile_completed": boolean
+})
 
 
 def serialize_business(business):
@@ -27,31 +94,19 @@ def serialize_business(business):
         :param business: Business Object
         :return: json serialized business info
     """
-    business_fields = {
-        "id": fields.Integer,
-        "business_name": fields.String,
-        "slug": fields.String,
-        "email": fields.String,
-        "phone": fields.String,
-        "city": fields.String,
-        "description": fields.String,
-        "place_id": fields.String,
-        "formatted_address": fields.String,
-        "latitude": fields.Float,
-        "longitude": fields.Float,
-        "active": fields.Boolean,
-        "verified": fields.Boolean,
-        "join_date": fields.DateTime(dt_format='iso8601'),
-        "rating": fields.String,
-        "profile_img": fields.String,
-        "weekday_opening": fields.String,
-        "weekday_closing": fields.String,
-        "weekend_opening": fields.String,
-        "weekend_closing": fields.String,
-        "profile_completed":fields.Boolean
-    }
-
-    return marshal(business, business_fields)
+    return serialize(business, BUSINESS_FIELDS)
+
+
+APPOINTMENT_FIELDS = compile_fields({
+    "id": integer,
+    "date": string,
+    "time": string,
+    "cancelled": boolean,
+    "comment": string,
+    "create_at": iso8601,
+    "completed": boolean,
+    "service_id": integer
+})
 
 
 def serialize_appointment(appointment):
@@ -60,18 +115,16 @@ def serialize_appointment(appointment):
         :param appointment: Appointment object
         :return: serialized appointment data
     """
-    appointment_fields = {
-        "id": fields.Integer,
-        "date": fields.String,
-        "time": fields.String,
-        "cancelled": fields.Boolean,
-        "comment": fields.String,
-        "create_at": fields.DateTime(dt_format='iso8601'),
-        "completed": fields.Boolean,
-        "service_id": fields.Integer
-    }
+    return serialize(appointment, APPOINTMENT_FIELDS)
 
-    return marshal(appointment, appointment_fields)
+
+NOTIFICATION_FIELDS = compile_fields({
+    "id": integer,
+    "message": string,
+    "title": string,
+    "sent_at": iso8601,
+    "read": boolean
+})
 
 
 def serialize_notification(notification):
@@ -80,15 +133,15 @@ def serialize_notification(notification):
         :param notification:
         :return: JSON serialized notification
     """
+    return serialize(notification, NOTIFICATION_FIELDS)
+
 
-    notification_fields = {
-        "id": fields.Integer,
-        "message": fields.String,
-        "title": fields.String,
-        "sent_at": fields.DateTime(dt_format='iso8601'),
-        "read": fields.Boolean
-    }
-    return marshal(notification, notification_fields)
+SALES_FIELDS = compile_fields({
+    "id": integer,
+    "payment_method": string,
+    "description": string,
+    "date_created": iso8601
+})
 
 
 def serialize_sale(sale):
@@ -97,13 +150,15 @@ def serialize_sale(sale):
         :param sale:
         :return: JSON serialized sale record
     """
-    sales_fields = {
-        "id": fields.Integer,
-        "payment_method": fields.String,
-        "description": fields.String,
-        "date_created": fields.DateTime(dt_format='iso8601')
-    }
-    return marshal(sale, sales_fields)
+    return serialize(sale, SALES_FIELDS)
+
+
+ACCOUNT_FIELDS = compile_fields({
+    "account_name": string,
+    "description": string,
+    "id": integer,
+    "business_id": integer
+})
 
 
 def serialize_account(account):
@@ -112,14 +167,18 @@ def serialize_account(account):
         :param account:
         :return: JSON serialized account data
     """
-    account_fields = {
-        "account_name": fields.String,
-        "description": fields.String,
-        "id": fields.Integer,
-        "business_id": fields.Integer
-    }
+    return serialize(account, ACCOUNT_FIELDS)
 
-    return marshal(account, account_fields)
+
+SERVICE_FIELDS = compile_fields({
+    "id": integer,
+    "service": string,
+    "description": string,
+    "business_id": integer,
+    "service_category": integer,
+    "price": integer,
+    "estimated_service_time": floating
+})
 
 
 def serialize_service(service):
@@ -128,17 +187,17 @@ def serialize_service(service):
         :param service:
         :return: Serialized service object
     """
-    service_fields = {
-        "id": fields.Integer,
-        "service": fields.String,
-        "description": fields.String,
-        "business_id": fields.Integer,
-        "service_category": fields.Integer,
-        "price": fields.Integer,
-        "estimated_service_time": fields.Float
-    }
+    return serialize(service, SERVICE_FIELDS)
+
 
-    return marshal(service, service_fields)
+EXPENSE_FIELDS = compile_fields({
+    "id": integer,
+    "expense": string,
+    "amount": integer,
+    "description": string,
+    "created_at": iso8601,
+    "expense_account": integer
+})
 
 
 def serialize_expenses(expense):
@@ -147,17 +206,15 @@ def serialize_expenses(expense):
         :param expense:
         :return: Serialized Expense
     """
+    return serialize(expense, EXPENSE_FIELDS)
 
-    expense_fields = {
-        "id": fields.Integer,
-        "expense": fields.String,
-        "amount": fields.Integer,
-        "description": fields.String,
-        "created_at": fields.DateTime(dt_format='iso8601'),
-        "expense_account": fields.Integer
-    }
 
-    return marshal(expense, expense_fields)
+INVENTORY_FIELDS = compile_fields({
+    "id": integer,
+    "product": string,
+    "status": string,
+    "updated_at": iso8601
+})
 
 
 def serialize_inventory(inventory):
@@ -166,15 +223,14 @@ def serialize_inventory(inventory):
         :param inventory:
         :return:
     """
+    return serialize(inventory, INVENTORY_FIELDS)
 
-    inventory_fields = {
-        "id": fields.Integer,
-        "product": fields.String,
-        "status": fields.String,
-        "updated_at": fields.DateTime(dt_format='iso8601')
-     }
 
-    return marshal(inventory, inventory_fields)
+REVIEW_FIELDS = compile_fields({
+    "id": integer,
+    "message": string,
+    "reviewed_at": iso8601
+})
 
 
 def serialize_review(review):
@@ -183,13 +239,17 @@ def serialize_review(review):
         :param review: Review
         :return: Serialized object
     """
-    review_fields = {
-        "id": fields.Integer,
-        "message": fields.String,
-        "reviewed_at": fields.DateTime(dt_format='iso8601')
-    }
+    return serialize(review, REVIEW_FIELDS)
+
 
-    return marshal(review, review_fields)
+STAFF_FIELDS = compile_fields({
+    "id": integer,
+    "f_name": string,
+    "phone": string,
+    "created_at": iso8601,
+    "role": string,
+    "public_id": string
+})
 
 
 def serialize_staff(staff):
@@ -198,15 +258,13 @@ def serialize_staff(staff):
         :param staff: Staff Object
         :return: JSON Serialized object
     """
-    staff_fields = {
-        "id": fields.Integer,
-        "f_name": fields.String,
-        "phone": fields.String,
-        "created_at": fields.DateTime(dt_format='iso8601'),
-        "role": fields.String,
-        "public_id": fields.String
-    }
-    return marshal(staff, staff_fields)
+    return serialize(staff, STAFF_FIELDS)
+
+
+CATEGORY_FIELDS = compile_fields({
+    "id": integer,
+    "category_name": string
+})
 
 
 def serialize_business_category(category):
@@ -215,12 +273,16 @@ def serialize_business_category(category):
         :param category: Category object
         :return:Json
     """
-    category_fields = {
-        "id": fields.Integer,
-        "category_name": fields.String
-    }
+    return serialize(category, CATEGORY_FIELDS)
 
-    return marshal(category, category_fields)
+
+AVAILABILITY_FIELDS = compile_fields({
+    "id": integer,
+    "date": iso8601,
+    "day_of_week": integer,
+    "start_time": string,
+    "end_time": string
+})
 
 
 def serialize_availability(availability):
@@ -229,14 +291,15 @@ def serialize_availability(availability):
         :param availability: Availability Object
         :return: JSON serialized object
     """
-    availability_fields = {
-        "id": fields.Integer,
-        "date": fields.DateTime(dt_format='iso8601'),
-        "day_of_week": fields.Integer,
-        "start_time": fields.String,
-        "end_time": fields.String
-    }
-    return marshal(availability, availability_fields)
+    return serialize(availability, AVAILABILITY_FIELDS)
+
+
+GALLERY_FIELDS = compile_fields({
+    "id": integer,
+    "created_at": iso8601,
+    "image_url": string,
+    "business_id": integer
+})
 
 
 def serialize_gallery(gallery):
@@ -245,11 +308,4 @@ def serialize_gallery(gallery):
         :param gallery: Gallery DB Object
         :return: Serialized gallery object
     """
-    gallery_fields = {
-        "id": fields.Integer,
-        "created_at": fields.DateTime(dt_format='iso8601'),
-        "image_url": fields.String,
-        "business_id": fields.Integer
-    }
-
-    return marshal(gallery, gallery_fields)
+    return serialize(gallery, GALLERY_FIELDS)
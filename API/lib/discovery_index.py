@@ -0,0 +1,253 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import func
+
+from API import db
+from API.models import Business, Service, Review
+from API.lib.geo import haversine_km, bounding_box
+
+GEOHASH_ALPHABET: str = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Precision 5 cells are roughly 4.9km x 4.9km at the equator
+GEOHASH_PRECISION: int = 5
+INDEX_TTL_SECONDS: int = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """
+        Standard base32 geohash of a point
+        :return: Geohash string of the given length
+    """
+    latitude_range: list = [-90.0, 90.0]
+    longitude_range: list = [-180.0, 180.0]
+    code: list = []
+    bits: int = 0
+    bit_count: int = 0
+    even: bool = True
+    while len(code) < precision:
+        value_range, value = (longitude_range, longitude) if even else (latitude_range, latitude)
+        middle: float = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            value_range[0] = middle
+        else:
+            bits = bits * 2
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            code.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(code)
+
+
+def _cell_size(precision: int) -> tuple:
+    """Height and width in degrees of a geohash cell"""
+    longitude_bits: int = (precision * 5 + 1) // 2
+    latitude_bits: int = precision * 5 // 2
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def covering_cells(box: tuple, precision: int = GEOHASH_PRECISION) -> set:
+    """
+        Geohash cells overlapping a bounding box
+        :param box: (min_latitude, max_latitude, min_longitude, max_longitude)
+        :return: Set of geohashes
+    """
+    min_latitude, max_latitude, min_longitude, max_longitude = box
+    cell_height, cell_width = _cell_size(precision)
+    cells: set = set()
+    latitude: float = min_latitude
+    while True:
+        longitude: float = min_longitude
+        while True:
+            cells.add(geohash(latitude, longitude, precision))
+            if longitude >= max_longitude:
+                break
+            longitude = min(longitude + cell_width, max_longitude)
+        if latitude >= max_latitude:
+            break
+        latitude = min(latitude + cell_height, max_latitude)
+    return cells
+
+
+class ServiceEntry(NamedTuple):
+    id: int
+    name: str
+    price: Optional[int]
+
+
+class DiscoveryRecord(NamedTuple):
+    """What discovery needs to know about a listed business"""
+    id: int
+    name: str
+    slug: str
+    latitude: float
+    longitude: float
+    rating: Optional[float]
+    reviews: int
+    services: tuple
+
+    def offers(self, service_name: str) -> tuple:
+        """Services matching the name (case-insensitive)"""
+        name: str = service_name.strip().lower()
+        return tuple(service for service in self.services if service.name.lower() == name)
+
+
+class DiscoveryIndex:
+    """
+        In-process index of listed (active, verified, profile completed) businesses bucketed by geohash.
+        Built on first use. Once older than INDEX_TTL_SECONDS it is rebuilt in a background thread, so
+        other workers' writes show up without a request waiting on the rebuild; reads keep using the
+        current index meanwhile. The write paths in this process refresh single businesses straight away.
+    """
+
+    def __init__(self, ttl: int = INDEX_TTL_SECONDS):
+        self.ttl: int = ttl
+        self._records: dict = {}
+        self._buckets: dict = defaultdict(set)
+        self._built_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+
+    @staticmethod
+    def _listed_query():
+        return Business.query.filter(
+            Business.active.is_(True),
+            Business.verified.is_(True),
+            Business.profile_completed.is_(True),
+            Business.latitude.isnot(None),
+            Business.longitude.isnot(None)
+        )
+
+    @staticmethod
+    def _load(businesses: list) -> list:
+        """Build records for the businesses with one query for services and one for review counts"""
+        business_ids: list = [business.id for business in businesses]
+        if not business_ids:
+            return []
+
+        services: dict = defaultdict(list)
+        service_rows = db.session.query(Service.business_id, Service.id, Service.service, Service.price) \
+            .filter(Service.business_id.in_(business_ids)).all()
+        for business_id, service_id, name, price in service_rows:
+            services[business_id].append(ServiceEntry(service_id, name, price))
+
+        reviews: dict = dict(
+            db.session.query(Review.business_id, func.count(Review.id))
+            .filter(Review.business_id.in_(business_ids))
+            .group_by(Review.business_id)
+            .all()
+        )
+
+        return [
+            DiscoveryRecord(
+                id=business.id,
+                name=business.business_name,
+                slug=business.slug,
+                latitude=business.latitude,
+                longitude=business.longitude,
+                rating=business.rating,
+                reviews=reviews.get(business.id, 0),
+                services=tuple(services[business.id])
+            )
+            for business in businesses
+        ]
+
+    def _remove(self, business_id: int) -> None:
+        record: Optional[DiscoveryRecord] = self._records.pop(business_id, None)
+        if record:
+            self._buckets[geohash(record.latitude, record.longitude)].discard(business_id)
+
+    def _add(self, record: DiscoveryRecord) -> None:
+        self._records[record.id] = record
+        self._buckets[geohash(record.latitude, record.longitude)].add(record.id)
+
+    def rebuild(self) -> int:
+        """
+            Reload every listed business. Needs an app context
+            :return: Number of indexed businesses
+        """
+        records: list = self._load(self._listed_query().all())
+        with self._lock:
+            self._records = {}
+            self._buckets = defaultdict(set)
+            for record in records:
+                self._add(record)
+            self._built_at = time.monotonic()
+            return len(self._records)
+
+    def refresh(self, business_id: int) -> None:
+        """
+            Reload one business after it changed, dropping it if it is no longer listed.
+            Skipped while the index hasn't been built; the first read loads everything.
+            :param business_id: ID of the changed business
+            :return: None
+        """
+        if self._built_at is None:
+            return
+        business: Optional[Business] = self._listed_query().filter(Business.id == business_id).first()
+        records: list = self._load([business] if business else [])
+        with self._lock:
+            self._remove(business_id)
+            for record in records:
+                self._add(record)
+
+    def _rebuild_in_background(self, app) -> None:
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Discovery index rebuild failed: {e}")
+        finally:
+            self._rebuilding.release()
+
+    def _ensure_fresh(self) -> None:
+        if self._built_at is None:
+            # Nothing to serve yet; the first read of the process has to wait for the build
+            with self._rebuilding:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        if time.monotonic() - self._built_at > self.ttl and self._rebuilding.acquire(blocking=False):
+            app = current_app._get_current_object()
+            threading.Thread(target=self._rebuild_in_background, args=(app,), daemon=True).start()
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float, service_name: Optional[str] = None) -> list:
+        """
+            Listed businesses within the radius, optionally only those offering a service
+            :param latitude: Search centre
+            :param longitude: Search centre
+            :param radius_km: Search radius in kilometres
+            :param service_name: Only businesses with a service of this name (case-insensitive)
+            :return: [(record, distance_km, matching_services)], nearest first
+        """
+        self._ensure_fresh()
+        box: tuple = bounding_box(latitude, longitude, radius_km)
+        cell_height, cell_width = _cell_size(GEOHASH_PRECISION)
+        cell_count: float = ((box[1] - box[0]) / cell_height + 1) * ((box[3] - box[2]) / cell_width + 1)
+        results: list = []
+        with self._lock:
+            # Near the poles or the antimeridian the box is too wide to enumerate; scan the occupied cells instead
+            cells = list(self._buckets) if cell_count > len(self._buckets) else covering_cells(box)
+            for cell in cells:
+                for business_id in self._buckets.get(cell, ()):
+                    record: DiscoveryRecord = self._records[business_id]
+                    matching: tuple = record.offers(service_name) if service_name else record.services
+                    if service_name and not matching:
+                        continue
+                    distance: float = haversine_km(latitude, longitude, record.latitude, record.longitude)
+                    if distance <= radius_km:
+                        results.append((record, distance, matching))
+        results.sort(key=lambda result: (result[1], result[0].id))
+        return results
+
+
+discovery_index = DiscoveryIndex()
@@ -0,0 +1,45 @@
+from typing import Optional
+
+# Every template an email notification is rendered from
+NOTIFICATION_TEMPLATES: tuple = (
+    "otp.html",
+    "reset.html",
+    "clientReset.html",
+    "activatebusiness.html",
+    "confirmAppointment.html",
+    "askForReview.html"
+)
+
+
+class EmailTemplates:
+    """
+        Flask extension holding the compiled notification templates, loaded once when the app
+        (or the Celery worker building it) starts.
+        Rendering goes straight to the compiled template: no template lookup or reload check,
+        no context processors and no render signals, so it needs neither a request nor an app context.
+        Jinja compiles the static markup (head, inline CSS, footer) into constant strings,
+        so a render only formats the few per-message values.
+    """
+
+    def __init__(self, app=None):
+        self.environment = None
+        self._templates: dict = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.environment = app.jinja_env
+        self._templates = {name: self.environment.get_template(name) for name in NOTIFICATION_TEMPLATES}
+        app.extensions["email_templates"] = self
+
+    def render(self, template_name: str, /, **context) -> str:
+        """
+            Render a notification template
+            :param template_name: Template file name e.g. otp.html. Positional only, templates take a `name` variable
+            :param context: Template variables
+            :return: HTML
+        """
+        template: Optional[object] = self._templates.get(template_name)
+        if template is None:
+            template = self._templates[template_name] = self.environment.get_template(template_name)
+        return template.render(context)
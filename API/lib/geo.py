@@ -0,0 +1,50 @@
+import math
+
+from API.models import Business
+
+EARTH_RADIUS_KM: float = 6371.0
+KM_PER_DEGREE_LATITUDE: float = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    """
+        Great-circle distance between two points
+        :return: Distance in kilometres
+    """
+    phi_1, phi_2 = math.radians(latitude), math.radians(other_latitude)
+    d_phi = phi_2 - phi_1
+    d_lambda = math.radians(other_longitude - longitude)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi_1) * math.cos(phi_2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple:
+    """
+        Smallest lat/lng box containing every point within radius_km of the centre.
+        Near the poles or across the antimeridian the longitude range is widened to the whole globe.
+        :return: (min_latitude, max_latitude, min_longitude, max_longitude)
+    """
+    latitude_delta: float = radius_km / KM_PER_DEGREE_LATITUDE
+    min_latitude: float = max(-90.0, latitude - latitude_delta)
+    max_latitude: float = min(90.0, latitude + latitude_delta)
+
+    widest: float = max(abs(min_latitude), abs(max_latitude))
+    if widest >= 90.0:
+        return min_latitude, max_latitude, -180.0, 180.0
+
+    longitude_delta: float = latitude_delta / math.cos(math.radians(widest))
+    if longitude - longitude_delta < -180.0 or longitude + longitude_delta > 180.0:
+        return min_latitude, max_latitude, -180.0, 180.0
+    return min_latitude, max_latitude, longitude - longitude_delta, longitude + longitude_delta
+
+
+def distance_order(latitude: float, longitude: float):
+    """
+        SQL expression ordering businesses by distance from a point (equirectangular approximation).
+        Plain arithmetic, so it runs on SQLite as well as Postgres.
+        :return: SQLAlchemy expression, smaller is nearer
+    """
+    longitude_scale: float = math.cos(math.radians(latitude))
+    north = Business.latitude - latitude
+    east = (Business.longitude - longitude) * longitude_scale
+    return north * north + east * east
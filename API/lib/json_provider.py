@@ -0,0 +1,42 @@
+import dataclasses
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+ORJSON_OPTIONS: int = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+def _default(obj):
+    """
+        Types orjson doesn't encode natively, handled the way Flask's default provider does
+        :param obj: Object being encoded
+        :return: JSON compatible value
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+        JSON provider backed by orjson. date, time and datetime values are encoded as ISO 8601 strings,
+        keys are sorted like Flask's default provider.
+    """
+    sort_keys: bool = True
+    mimetype: str = "application/json"
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body: bytes = orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,170 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import current_app
+from flask_mail import Connection
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the connection is dropped and the message retried once on a fresh one.
+# Not SMTPException in general: a refused recipient would fail again on any connection.
+CONNECTION_ERRORS: tuple = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError
+)
+
+
+class MailTransportUnavailable(Exception):
+    """The SMTP server can't be reached or keeps dropping the connection"""
+
+
+class PooledConnection:
+    """An open flask_mail Connection and when it was last used"""
+
+    def __init__(self, state):
+        self.connection: Connection = Connection(state)
+        self.connection.__enter__()
+        self.last_used: float = time.monotonic()
+
+    def send(self, message) -> None:
+        self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.connection.__exit__(None, None, None)
+        except Exception:
+            # The server may already have dropped it
+            pass
+
+
+class MailTransport:
+    """
+        Flask extension keeping up to MAIL_POOL_SIZE authenticated SMTP connections open,
+        so sends skip the TCP and TLS handshakes. Connections idle for longer than
+        MAIL_POOL_IDLE_SECONDS are closed rather than reused, as the server will have dropped them.
+        Pools are per process, so forked Celery workers never share a socket.
+    """
+
+    def __init__(self, app=None):
+        self.pool_size: int = 2
+        self.idle_seconds: int = 60
+        self._pool: list = []
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.pool_size = app.config.get("MAIL_POOL_SIZE", 2)
+        self.idle_seconds = app.config.get("MAIL_POOL_IDLE_SECONDS", 60)
+        app.extensions["mail_transport"] = self
+
+    def _checkout(self) -> PooledConnection:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited from the parent process; leave those sockets alone
+                self._pool = []
+                self._pid = os.getpid()
+            while self._pool:
+                pooled: PooledConnection = self._pool.pop()
+                if time.monotonic() - pooled.last_used < self.idle_seconds:
+                    return pooled
+                pooled.close()
+        return PooledConnection(current_app.extensions["mail"])
+
+    def _release(self, pooled: PooledConnection) -> None:
+        with self._lock:
+            if len(self._pool) < self.pool_size and self._pid == os.getpid():
+                self._pool.append(pooled)
+                return
+        pooled.close()
+
+    @contextmanager
+    def connection(self):
+        """
+            Check out a pooled connection for several sends. Its send() reconnects once on a dropped connection.
+            The connection goes back to the pool afterwards.
+        """
+        session = _TransportSession(self)
+        try:
+            yield session
+        finally:
+            session.finish()
+
+    def send(self, message) -> None:
+        """
+            Send a flask_mail Message over a pooled connection. Raises like Mail.send
+            :param message: flask_mail Message
+            :return: None
+        """
+        with self.connection() as connection:
+            connection.send(message)
+
+    def send_many(self, messages: list) -> list:
+        """
+            Send messages over one pooled connection. A failed message doesn't stop the rest
+            :param messages: flask_mail Messages
+            :return: List of booleans, True where the message was sent
+        """
+        results: list = []
+        with self.connection() as connection:
+            for message in messages:
+                try:
+                    connection.send(message)
+                except Exception as e:
+                    logger.warning(f"Failed to send '{message.subject}' to {message.recipients}: {e}")
+                    results.append(False)
+                else:
+                    results.append(True)
+        return results
+
+
+class _TransportSession:
+    """Connection handed out by MailTransport.connection(). Opens its SMTP connection on first send"""
+
+    def __init__(self, transport: MailTransport):
+        self.transport: MailTransport = transport
+        self.pooled: Optional[PooledConnection] = None
+
+    def send(self, message) -> None:
+        """
+            Raises MailTransportUnavailable if no connection can be opened or it drops again after reconnecting.
+            Other errors, e.g. a refused recipient, propagate as they are.
+        """
+        if self.pooled is None:
+            self._open(self.transport._checkout)
+        try:
+            self.pooled.send(message)
+            return
+        except CONNECTION_ERRORS as e:
+            logger.info(f"SMTP connection lost ({e}), reconnecting")
+            self.pooled.close()
+            self.pooled = None
+
+        self._open(lambda: PooledConnection(current_app.extensions["mail"]))
+        try:
+            self.pooled.send(message)
+        except CONNECTION_ERRORS as e:
+            self.pooled.close()
+            self.pooled = None
+            raise MailTransportUnavailable(str(e)) from e
+
+    def _open(self, connect) -> None:
+        try:
+            self.pooled = connect()
+        except OSError as e:
+            # Includes refused connections, DNS failures and SMTP login errors
+            raise MailTransportUnavailable(str(e)) from e
+
+    def finish(self) -> None:
+        if self.pooled is not None:
+            self.transport._release(self.pooled)
+            self.pooled = None
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+
+from API import db
+from API.models import DailyBusinessMetric, Sale, Expense, Appointment
+
+METRIC_FIELDS: tuple = ("sales_count", "revenue", "expense_total", "appointments_completed")
+
+
+def _day(value) -> date:
+    """Day a timestamp or date belongs to. SQLite returns func.date() as an ISO string"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def bump_daily_metrics(business_id: int, day: date, **deltas: int) -> None:
+    """
+        Add the deltas to the business's rollup row for the day, creating the row if needed.
+        Runs in the caller's transaction; the caller commits.
+        :param business_id: ID of the business
+        :param day: Day the change belongs to
+        :param deltas: Amounts to add, keyed by DailyBusinessMetric column e.g. revenue=500
+        :return: None
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    statement = update(DailyBusinessMetric) \
+        .where(DailyBusinessMetric.business_id == business_id, DailyBusinessMetric.day == day) \
+        .values({field: getattr(DailyBusinessMetric, field) + delta for field, delta in deltas.items()})
+
+    if db.session.execute(statement).rowcount:
+        return
+
+    row: dict = {field: 0 for field in METRIC_FIELDS}
+    row.update(deltas)
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailyBusinessMetric(business_id=business_id, day=day, **row))
+    except IntegrityError:
+        # A concurrent request created the row first
+        db.session.execute(statement)
+
+
+def track_sale(sale: Sale, sign: int = 1) -> None:
+    """
+        Add (sign=1) or remove (sign=-1) a sale from the rollup. The sale must be flushed.
+        Revenue is the price stored on the sale, so later service price changes don't affect it.
+        :param sale: Sale record
+        :param sign: 1 when recording, -1 when deleting
+        :return: None
+    """
+    bump_daily_metrics(
+        sale.business_id,
+        _day(sale.date_created),
+        sales_count=sign,
+        revenue=sign * (sale.price or 0)
+    )
+
+
+def track_expense(expense: Expense, sign: int = 1) -> None:
+    """
+        Add (sign=1) or remove (sign=-1) an expense from the rollup. The expense must be flushed.
+        :param expense: Expense record
+        :param sign: 1 when recording, -1 when deleting
+        :return: None
+    """
+    bump_daily_metrics(expense.business_id, _day(expense.created_at), expense_total=sign * int(expense.amount))
+
+
+def track_completed_appointment(appointment: Appointment) -> None:
+    """
+        Count a completed appointment on the day it was booked for.
+        :param appointment: Appointment that has just been completed
+        :return: None
+    """
+    bump_daily_metrics(appointment.business_id, appointment.date, appointments_completed=1)
+
+
+def rebuild_daily_metrics(business_id: Optional[int] = None) -> int:
+    """
+        Recompute the rollup from the sales, expenses and appointments tables.
+        :param business_id: Only rebuild this business. Rebuild every business if None
+        :return: Number of rollup rows written
+    """
+    rows: dict = defaultdict(lambda: {field: 0 for field in METRIC_FIELDS})
+
+    sales = db.session.query(
+        Sale.business_id, func.date(Sale.date_created), func.count(Sale.id), func.coalesce(func.sum(Sale.price), 0)
+    ) \
+        .group_by(Sale.business_id, func.date(Sale.date_created))
+
+    expenses = db.session.query(Expense.business_id, func.date(Expense.created_at), func.sum(Expense.amount)) \
+        .group_by(Expense.business_id, func.date(Expense.created_at))
+
+    appointments = db.session.query(Appointment.business_id, Appointment.date, func.count(Appointment.id)) \
+        .filter(Appointment.completed.is_(True)) \
+        .group_by(Appointment.business_id, Appointment.date)
+
+    if business_id is not None:
+        sales = sales.filter(Sale.business_id == business_id)
+        expenses = expenses.filter(Expense.business_id == business_id)
+        appointments = appointments.filter(Appointment.business_id == business_id)
+
+    for owner_id, day, sales_count, revenue in sales:
+        rows[(owner_id, _day(day))]["sales_count"] = sales_count
+        rows[(owner_id, _day(day))]["revenue"] = int(revenue)
+
+    for owner_id, day, expense_total in expenses:
+        rows[(owner_id, _day(day))]["expense_total"] = int(expense_total or 0)
+
+    for owner_id, day, completed in appointments:
+        rows[(owner_id, _day(day))]["appointments_completed"] = completed
+
+    stale = DailyBusinessMetric.query
+    if business_id is not None:
+        stale = stale.filter(DailyBusinessMetric.business_id == business_id)
+    stale.delete(synchronize_session=False)
+
+    metrics: list = [
+        DailyBusinessMetric(business_id=owner_id, day=day, **values)
+        for (owner_id, day), values in rows.items()
+        if owner_id is not None
+    ]
+    db.session.add_all(metrics)
+    db.session.commit()
+    return len(metrics)
+
+
+@click.command("rebuild-metrics")
+@click.option("--business-id", type=int, default=None, help="Only rebuild this business")
+@with_appcontext
+def rebuild_metrics_command(business_id):
+    """Rebuild the daily business metrics rollup"""
+    written = rebuild_daily_metrics(business_id)
+    click.echo(f"Rebuilt {written} daily metric rows")
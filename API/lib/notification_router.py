@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from API import cache
+
+logger = logging.getLogger(__name__)
+
+EMAIL: str = "email"
+SMS: str = "sms"
+WHATSAPP: str = "whatsapp"
+CHANNELS: tuple = (EMAIL, SMS, WHATSAPP)
+# Booking confirmations always include the email; choosing email means no text message on top
+CONFIRMATION_CHANNELS: tuple = (EMAIL, SMS, WHATSAPP)
+# Reminders and reschedules only exist as text messages, so email-only clients get DEFAULT_CHANNEL
+MESSAGE_CHANNELS: tuple = (SMS, WHATSAPP)
+DEFAULT_CHANNEL: str = SMS
+
+# Provider of each channel -> (sends per second, burst). Kept under the providers' own throttling
+PROVIDER_LIMITS: dict = {
+    "celcom": (10.0, 20),
+    "twilio": (1.0, 5),
+    "smtp": (5.0, 10)
+}
+CHANNEL_PROVIDERS: dict = {SMS: "celcom", WHATSAPP: "twilio", EMAIL: "smtp"}
+# How long a send waits for a rate limit token before giving up and being retried later
+THROTTLE_WAIT_SECONDS: float = 5.0
+# Identical sends (same channel, recipient and content) within this window go out once
+DEDUPE_WINDOW_SECONDS: int = 10 * 60
+# States of a dedupe key: claimed by a send in progress, then sent
+SENDING: str = "sending"
+SENT: str = "sent"
+
+
+def normalize_channel(value: Optional[str]) -> Optional[str]:
+    """Channel named by a notification_mode or client preference, None if it isn't one"""
+    channel: str = (value or "").strip().lower()
+    return channel if channel in CHANNELS else None
+
+
+def route(notification_mode: Optional[str], preference: Optional[str] = None,
+          supported: tuple = CHANNELS) -> str:
+    """
+        Pick the channel of a notification.
+        The appointment's notification_mode wins over the client's preference;
+        a choice the notification can't go out on falls through to the next one, then DEFAULT_CHANNEL.
+        :param notification_mode: Appointment.notification_mode
+        :param preference: Client.notification_channel
+        :param supported: Channels this notification can be sent on
+        :return: Channel
+    """
+    for choice in (notification_mode, preference):
+        channel: Optional[str] = normalize_channel(choice)
+        if channel in supported:
+            return channel
+    return DEFAULT_CHANNEL
+
+
+class TokenBucket:
+    """
+        Thread-safe token bucket: refills at rate tokens per second up to capacity.
+        Limits are per process, so the provider sees at most rate x worker processes.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate: float = rate
+        self.capacity: int = capacity
+        self._tokens: float = capacity
+        self._updated_at: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """
+            Take a token, waiting up to timeout seconds for one
+            :return: True if a token was taken
+        """
+        deadline: float = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now: float = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait: float = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+rate_limits: dict = {provider: TokenBucket(rate, burst) for provider, (rate, burst) in PROVIDER_LIMITS.items()}
+
+
+def dedupe_key(channel: str, recipient: str, content: str) -> str:
+    digest: str = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    return f"notification_dedupe:{channel}:{recipient}:{digest}"
+
+
+def dispatch(channel: str, recipient: str, content: str, send: Callable[[], bool],
+             wait: float = THROTTLE_WAIT_SECONDS) -> bool:
+    """
+        Send a notification through its channel's provider.
+        The send is claimed atomically first; only the claimant sends. A send identical to one made
+        within DEDUPE_WINDOW_SECONDS is skipped and counts as sent, while one still in flight elsewhere
+        counts as not sent, so the caller retries it instead of assuming it went out.
+        Waits up to `wait` seconds for the provider's rate limit; if throttled nothing is sent.
+        :param channel: email, sms or whatsapp
+        :param recipient: Email address or phone number
+        :param content: What is sent, used to recognise duplicates
+        :param send: Does the actual send, returns True if the provider accepted it
+        :param wait: Seconds to wait for a rate limit token
+        :return: True if sent (or already sent), False if throttled, in flight elsewhere or the send failed
+    """
+    key: str = dedupe_key(channel, recipient, content)
+    if not cache.add(key, SENDING, DEDUPE_WINDOW_SECONDS):
+        if cache.get(key) == SENT:
+            logger.info(f"Skipping duplicate {channel} notification to {recipient}")
+            return True
+        logger.info(f"{channel} notification to {recipient} is already being sent")
+        return False
+
+    sent: bool = False
+    try:
+        if not rate_limits[CHANNEL_PROVIDERS[channel]].acquire(wait):
+            logger.warning(f"{channel} notification to {recipient} throttled")
+            return False
+        sent = send()
+        return sent
+    finally:
+        if sent:
+            cache.set(key, SENT, DEDUPE_WINDOW_SECONDS)
+        else:
+            # Let the retry through
+            cache.delete(key)
@@ -0,0 +1,356 @@
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+from typing import Optional
+
+from celery import shared_task
+from sqlalchemy.exc import IntegrityError
+
+from API import db
+from API.models import NotificationDispatch, Appointment
+from API.lib.sendSMS import send_sms
+from API.lib.send_messages import send_whatsapp, whatsapp_reminder_message
+from API.lib.SMS_messages import appointment_remainder_message
+from API.lib.notification_router import (
+    dispatch,
+    route,
+    EMAIL,
+    SMS,
+    WHATSAPP,
+    MESSAGE_CHANNELS,
+    THROTTLE_WAIT_SECONDS
+)
+from API.lib.query_options import reminder_appointment_options
+from API.lib.send_mail import (
+    send_otp,
+    send_reset_email,
+    sent_client_reset_token,
+    business_account_activation_email,
+    appointment_confirmation_email,
+    send_ask_for_review_mail
+)
+
+logger = logging.getLogger(__name__)
+
+# Email notification type -> function sending it. Task params are the function's keyword arguments
+EMAIL_SENDERS: dict = {
+    "otp": send_otp,
+    "business_password_reset": send_reset_email,
+    "client_password_reset": sent_client_reset_token,
+    "business_activation": business_account_activation_email,
+    "appointment_confirmation": appointment_confirmation_email,
+    "ask_for_review": send_ask_for_review_mail
+}
+# Types that fall back to the FailedNotification resend task once the retries run out
+RESENDABLE_EMAILS: tuple = ("appointment_confirmation", "ask_for_review")
+
+MAX_RETRIES: int = 5
+RETRY_BACKOFF_MAX_SECONDS: int = 10 * 60
+# Concurrent provider requests while sending reminders. Kept within the provider connection pool (PROVIDER_POOL_SIZE)
+REMINDER_WORKERS: int = 8
+# Reminder sends queue behind the provider rate limit for this long before counting as failed
+REMINDER_THROTTLE_WAIT_SECONDS: float = 60.0
+# Idempotency keys are kept this long, well past task retries, redeliveries and a day's reminder reruns
+DISPATCH_RETENTION: timedelta = timedelta(days=30)
+
+
+class NotificationNotSent(Exception):
+    """The provider didn't accept the notification. Raised so Celery retries the task"""
+
+
+def already_sent(key: str) -> bool:
+    return db.session.get(NotificationDispatch, key) is not None
+
+
+def mark_sent(key: str, notification_type: str) -> None:
+    """
+        Record an idempotency key once its notification has gone out
+        :param key: Idempotency key
+        :param notification_type: e.g. otp, sms
+        :return: None
+    """
+    try:
+        db.session.add(NotificationDispatch(key=key, notification_type=notification_type,
+                                            sent_at=datetime.utcnow()))
+        db.session.commit()
+    except IntegrityError:
+        # A redelivered copy of the task recorded it first
+        db.session.rollback()
+
+
+def claim_keys(keys: list, notification_type: str) -> set:
+    """
+        Record idempotency keys before their notifications are sent, so an overlapping or redelivered run
+        skips them. Committed once; a key another run holds is left out.
+        :param keys: Idempotency keys
+        :param notification_type: e.g. appointment_reminder
+        :return: Keys claimed by this call
+    """
+    claimed: set = set()
+    sent_at: datetime = datetime.utcnow()
+    for key in keys:
+        try:
+            with db.session.begin_nested():
+                db.session.add(NotificationDispatch(key=key, notification_type=notification_type, sent_at=sent_at))
+        except IntegrityError:
+            continue
+        claimed.add(key)
+    db.session.commit()
+    return claimed
+
+
+def release_keys(keys: list) -> None:
+    """
+        Drop claims whose notifications failed, so the next run tries them again
+        :param keys: Idempotency keys from claim_keys
+        :return: None
+    """
+    if keys:
+        NotificationDispatch.query.filter(NotificationDispatch.key.in_(keys)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+@shared_task
+def purge_notification_dispatches() -> int:
+    """
+        Delete idempotency keys older than DISPATCH_RETENTION. Most are random keys that are never looked up again
+        :return: Number of keys deleted
+    """
+    deleted: int = NotificationDispatch.query \
+        .filter(NotificationDispatch.sent_at < datetime.utcnow() - DISPATCH_RETENTION) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    logger.info(f"Purged {deleted} notification dispatch keys")
+    return deleted
+
+
+def send_email(notification_type: str, params: dict) -> bool:
+    """
+        Send an email notification through the router: deduplicated and rate limited
+        :param notification_type: Key of EMAIL_SENDERS
+        :param params: Keyword arguments of the sending function
+        :return: True if sent
+    """
+    content: str = notification_type + json.dumps(
+        {name: value for name, value in params.items() if name != "log_failure"}, sort_keys=True, default=str
+    )
+    return dispatch(EMAIL, params.get("recipient"), content, lambda: EMAIL_SENDERS[notification_type](**params))
+
+
+def _celcom_send(phone: str, message: str) -> bool:
+    try:
+        return send_sms(phone, message).status_code == 200
+    except Exception as e:
+        logger.warning(f"SMS to {phone} failed: {e}")
+        return False
+
+
+# Text channel -> function sending a message on it
+MESSAGE_SENDERS: dict = {
+    SMS: _celcom_send,
+    WHATSAPP: send_whatsapp
+}
+
+
+def send_message(channel: str, phone: str, message: str, wait: float = THROTTLE_WAIT_SECONDS) -> bool:
+    """
+        Send a text message through the router: deduplicated and rate limited. Touches no database state
+        :param channel: sms or whatsapp
+        :param phone: Recipient phone number
+        :param message: Message text
+        :param wait: Seconds to wait for the provider's rate limit
+        :return: True if sent
+    """
+    return dispatch(channel, phone, message, lambda: MESSAGE_SENDERS[channel](phone, message), wait=wait)
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(NotificationNotSent,),
+    retry_backoff=True,
+    retry_backoff_max=RETRY_BACKOFF_MAX_SECONDS,
+    retry_jitter=True,
+    max_retries=MAX_RETRIES
+)
+def send_email_task(self, notification_type: str, params: dict, idempotency_key: str) -> bool:
+    """
+        Send an email notification, retrying with exponential backoff
+        :param notification_type: Key of EMAIL_SENDERS
+        :param params: Keyword arguments of the sending function. Must be JSON serializable
+        :param idempotency_key: The email is sent at most once per key
+        :return: True if sent, False if skipped or given up on
+    """
+    if already_sent(idempotency_key):
+        logger.info(f"Skipping {notification_type} email {idempotency_key}: already sent")
+        return False
+
+    final_attempt: bool = self.request.retries >= self.max_retries
+    kwargs: dict = dict(params)
+    if notification_type in RESENDABLE_EMAILS:
+        # Only the last attempt hands the notification over to the resend task
+        kwargs["log_failure"] = final_attempt
+
+    if send_email(notification_type, kwargs):
+        mark_sent(idempotency_key, notification_type)
+        return True
+
+    if final_attempt:
+        logger.error(f"Giving up on {notification_type} email {idempotency_key} after {self.request.retries} retries")
+        return False
+    raise NotificationNotSent(f"{notification_type} email {idempotency_key} not sent")
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(NotificationNotSent,),
+    retry_backoff=True,
+    retry_backoff_max=RETRY_BACKOFF_MAX_SECONDS,
+    retry_jitter=True,
+    max_retries=MAX_RETRIES
+)
+def send_sms_task(self, phone: str, message: str, idempotency_key: str, channel: str = SMS) -> bool:
+    """
+        Send a text message by SMS or whatsapp, retrying with exponential backoff.
+        Throttled sends are retried the same way.
+        :param phone: Recipient phone number
+        :param message: Message text
+        :param idempotency_key: The message is sent at most once per key
+        :param channel: sms or whatsapp
+        :return: True if sent, False if skipped or given up on
+    """
+    if already_sent(idempotency_key):
+        logger.info(f"Skipping {channel} {idempotency_key}: already sent")
+        return False
+
+    if send_message(channel, phone, message):
+        mark_sent(idempotency_key, channel)
+        return True
+
+    if self.request.retries >= self.max_retries:
+        logger.error(f"Giving up on {channel} {idempotency_key} after {self.request.retries} retries")
+        return False
+    raise NotificationNotSent(f"{channel} {idempotency_key} not sent")
+
+
+def reminder_key(appointment_id: int) -> str:
+    return f"appointment_reminder:{appointment_id}"
+
+
+def reminder_message(appointment: Appointment, channel: str) -> str:
+    if channel == WHATSAPP:
+        return whatsapp_reminder_message(
+            business=appointment.business.business_name,
+            service=appointment.service.service,
+            date=appointment.date,
+            time=appointment.time
+        )
+    return appointment_remainder_message(
+        business=appointment.business.business_name,
+        date_=appointment.date,
+        time_=appointment.time.strftime("%H:%M"),
+        name=(appointment.client.name or "there").split()[0],
+        service=appointment.service.service
+    )
+
+
+def send_reminder(reminder: tuple) -> bool:
+    """
+        Send one composed reminder. Never raises, so one bad send can't leave the others' claims behind
+        :param reminder: (key, channel, phone, message)
+        :return: True if sent
+    """
+    key, channel, phone, message = reminder
+    try:
+        return send_message(channel, phone, message, wait=REMINDER_THROTTLE_WAIT_SECONDS)
+    except Exception as e:
+        logger.error(f"Reminder {key} failed: {e}")
+        return False
+
+
+@shared_task(acks_late=True)
+def send_appointment_reminders(day: Optional[str] = None) -> dict:
+    """
+        Send the reminder of every upcoming appointment of the day, by SMS or whatsapp as routed from
+        the appointment's notification_mode and the client's preferred channel.
+        Appointments are loaded with their client, business and service in one query and the reminders are
+        sent REMINDER_WORKERS at a time, paced by the providers' rate limits.
+        Messages are composed first; appointments whose client, service or business was deleted are logged and
+        skipped. Only the keys of composed reminders are claimed, before anything is sent, so a redelivered task or
+        an overlapping run never sends one twice; claims of failed sends are released for the next run.
+        A crash between claiming and sending drops those reminders rather than doubling them.
+        :param day: ISO date. Defaults to today
+        :return: {"attempted", "sent", "failed", "skipped"}
+    """
+    reminder_date: date = date.fromisoformat(day) if day else datetime.today().date()
+    appointments: list = Appointment.query.options(*reminder_appointment_options()) \
+        .filter(Appointment.date == reminder_date, ~Appointment.cancelled, ~Appointment.completed) \
+        .all()
+
+    # Messages are composed here, in the task's thread, so the pool threads never touch the session
+    composed: list = []
+    for appointment in appointments:
+        if appointment.client is None or appointment.service is None or appointment.business is None:
+            logger.warning(f"Skipping reminder of appointment {appointment.id}: its client, service or business was deleted")
+            continue
+        channel: str = route(appointment.notification_mode, appointment.client.notification_channel, MESSAGE_CHANNELS)
+        composed.append((reminder_key(appointment.id), channel, appointment.client.phone,
+                         reminder_message(appointment, channel)))
+
+    claimed: set = claim_keys([reminder[0] for reminder in composed], "appointment_reminder")
+    pending: list = [reminder for reminder in composed if reminder[0] in claimed]
+
+    with ThreadPoolExecutor(max_workers=REMINDER_WORKERS) as pool:
+        outcomes: list = list(pool.map(send_reminder, pending))
+
+    failed: list = [reminder[0] for reminder, sent in zip(pending, outcomes) if not sent]
+    release_keys(failed)
+
+    results: dict = {
+        "attempted": len(pending),
+        "sent": len(pending) - len(failed),
+        "failed": len(failed),
+        "skipped": len(appointments) - len(pending)
+    }
+    logger.info(f"Reminders for {reminder_date}: {results}")
+    return results
+
+
+def queue_email(notification_type: str, idempotency_key: Optional[str] = None, **params) -> None:
+    """
+        Send an email notification in the background.
+        If the broker can't be reached the email is sent inline instead, as before the queue existed.
+        :param notification_type: Key of EMAIL_SENDERS
+        :param idempotency_key: Stable key for notifications that must go out once e.g. per appointment.
+            Defaults to a random key, which still protects against task redelivery
+        :param params: Keyword arguments of the sending function. Must be JSON serializable
+        :return: None
+    """
+    key: str = idempotency_key or f"{notification_type}:{uuid.uuid4()}"
+    try:
+        send_email_task.delay(notification_type, params, key)
+    except Exception as e:
+        logger.error(f"Could not queue {notification_type} email {key}, sending inline: {e}")
+        if send_email(notification_type, params):
+            mark_sent(key, notification_type)
+
+
+def queue_message(channel: str, phone: str, message: str, idempotency_key: Optional[str] = None) -> None:
+    """
+        Send a text message by SMS or whatsapp in the background. Sent inline if the broker can't be reached
+        :param channel: sms or whatsapp, usually from notification_router.route
+        :param phone: Recipient phone number
+        :param message: Message text
+        :param idempotency_key: Stable key for messages that must go out once. Defaults to a random key
+        :return: None
+    """
+    key: str = idempotency_key or f"{channel}:{uuid.uuid4()}"
+    try:
+        send_sms_task.delay(phone, message, key, channel)
+    except Exception as e:
+        logger.error(f"Could not queue {channel} {key}, sending inline: {e}")
+        if send_message(channel, phone, message):
+            mark_sent(key, channel)
@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from typing import Callable, Optional
+
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE: int = 50
+MAX_PAGE_SIZE: int = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token can't be decoded for the requested ordering"""
+
+
+def page_args() -> tuple:
+    """
+        Read the cursor and limit query parameters of a list request
+        :return: (cursor, limit). Limit is clamped to 1 - MAX_PAGE_SIZE
+    """
+    limit: int = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return request.args.get("cursor") or None, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _encode_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (datetime, date, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values: tuple) -> str:
+    """
+        Opaque token for the position after the row with these ordering values
+        :param values: Values of the ordering columns for the last row on the page
+        :return: URL safe token
+    """
+    payload: bytes = json.dumps([_encode_value(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token: str, columns: tuple) -> tuple:
+    """
+        Ordering values encoded in a cursor token
+        :param token: Token from encode_cursor
+        :param columns: Ordering columns the token was created for
+        :return: Values typed to match the columns
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor("Invalid cursor")
+        return tuple(_decode_value(column, value) for column, value in zip(columns, values))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def keyset_paginate(query, columns: tuple, cursor: Optional[str], limit: int, descending: bool = True,
+                    entity: Optional[Callable] = None) -> tuple:
+    """
+        Fetch one page of a query ordered by the columns, starting after the cursor.
+        The columns must be non-nullable and end with a unique column e.g. (Sale.date_created, Sale.id)
+        :param query: Filtered query. Any existing ordering is replaced
+        :param columns: Ordering columns, backed by an index
+        :param cursor: Token returned as the previous page's next cursor. None for the first page
+        :param limit: Page size
+        :param descending: Newest first when True
+        :param entity: Picks the mapped object holding the columns out of a row, for queries returning
+            several entities e.g. lambda row: row[0] for (Service, Business) rows. Defaults to the row itself
+        :return: (rows, next_cursor). next_cursor is None on the last page
+    """
+    query = query.order_by(None).order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+    if cursor:
+        position = tuple_(*columns)
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(position < values if descending else position > values)
+
+    rows: list = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = entity(rows[-1]) if entity else rows[-1]
+    next_cursor: str = encode_cursor(tuple(getattr(last, column.key) for column in columns))
+    return rows, next_cursor
@@ -0,0 +1,65 @@
+import os
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds. Without a timeout a slow provider would hold the worker indefinitely
+PROVIDER_TIMEOUT: tuple = (5, 15)
+# Connections kept alive per provider host; covers the reminder job's concurrent sends
+PROVIDER_POOL_SIZE: int = 10
+PROVIDER_RETRIES: int = 3
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter applying PROVIDER_TIMEOUT to requests that don't set their own"""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = PROVIDER_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def http_session() -> requests.Session:
+    """
+        Keep-alive session shared by the SMS and messaging provider calls of this process.
+        Connection failures are retried with backoff. 502/503/504 responses are retried for
+        idempotent requests only, so a POST that reached the provider is never sent twice.
+        :return: requests.Session
+    """
+    retry: Retry = Retry(
+        total=PROVIDER_RETRIES,
+        connect=PROVIDER_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    adapter: TimeoutHTTPAdapter = TimeoutHTTPAdapter(pool_maxsize=PROVIDER_POOL_SIZE, max_retries=retry)
+    session: requests.Session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def twilio_client():
+    """
+        Twilio client of this process, reusing its pooled HTTP connections
+        :return: twilio.rest.Client
+    """
+    from twilio.rest import Client
+    from twilio.http.http_client import TwilioHttpClient
+
+    http_client = TwilioHttpClient(pool_connections=True, timeout=PROVIDER_TIMEOUT[1], max_retries=PROVIDER_RETRIES)
+    return Client(os.getenv("TWILIO_SID"), os.getenv("TWILIO_AUTH_TOKEN"), http_client=http_client)
+
+
+def _reset_after_fork() -> None:
+    # A forked Celery worker must not share the parent's sockets
+    http_session.cache_clear()
+    twilio_client.cache_clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
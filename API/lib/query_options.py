@@ -0,0 +1,67 @@
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from API import db
+from API.models import Appointment, Sale, Expense, Review, Service
+
+
+def sale_list_options() -> tuple:
+    """Sales listed with their service"""
+    return (joinedload(Sale.service),)
+
+
+def client_appointment_options() -> tuple:
+    """Client's appointments listed with the business they are booked at"""
+    return (joinedload(Appointment.business),)
+
+
+def business_appointment_options() -> tuple:
+    """Business calendar: appointments with their service, staff and client"""
+    return (
+        joinedload(Appointment.service),
+        joinedload(Appointment.staff),
+        joinedload(Appointment.client)
+    )
+
+
+def appointment_client_options() -> tuple:
+    """Appointments listed with their client"""
+    return (joinedload(Appointment.client),)
+
+
+def reminder_appointment_options() -> tuple:
+    """Appointments with everything a reminder message needs"""
+    return (
+        joinedload(Appointment.client),
+        joinedload(Appointment.business),
+        joinedload(Appointment.service)
+    )
+
+
+def expense_list_options() -> tuple:
+    """Expenses listed with their expense account"""
+    return (joinedload(Expense.account),)
+
+
+def review_list_options() -> tuple:
+    """Reviews listed with the reviewing client"""
+    return (joinedload(Review.client),)
+
+
+def service_list_options() -> tuple:
+    """Services listed with their category"""
+    return (joinedload(Service.category),)
+
+
+def review_counts(business_ids: list) -> dict:
+    """
+        Number of reviews per business in one grouped query
+        :param business_ids: IDs of the businesses
+        :return: {business_id: count}. Businesses without reviews are left out
+    """
+    if not business_ids:
+        return {}
+    counts = db.session.query(Review.business_id, func.count(Review.id)) \
+        .filter(Review.business_id.in_(business_ids)) \
+        .group_by(Review.business_id)
+    return dict(counts.all())
@@ -1,21 +1,39 @@
-from collections import Counter
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 
+from API import db
+from API.models import RatingSummary
 
-def calculate_ratings(ratings: list, breakdown: bool):
+RATING_VALUES: range = range(1, 6)
+
+
+def record_rating(business_id: int, stars: int) -> RatingSummary:
     """
-        Calculate the average ratings and breakdown the rating into classes 1-5
-        :param ratings: The list of ratings
-        :param breakdown: Whether to breakdown ratings that is count the number of rating for each rating value
-        :return: Average rating, Ratings breakdown
+        Add a rating to the business's summary with a single atomic UPDATE, creating the summary if needed.
+        Runs in the caller's transaction; the caller commits.
+        :param business_id: ID of the rated business
+        :param stars: Rating value 1 - 5
+        :return: Updated summary
     """
-    ratings_list = [rating.rating for rating in ratings]
-    try:
-        rating_score = round(sum(ratings_list) / len(ratings_list))
-    except ZeroDivisionError:
-        return None
-    else:
-        if breakdown:
-            count = Counter(ratings_list)
-            return rating_score, dict(count)
-        else:
-            return rating_score
+    stars_column = getattr(RatingSummary, f"stars_{stars}")
+    statement = update(RatingSummary) \
+        .where(RatingSummary.business_id == business_id) \
+        .values({
+            RatingSummary.ratings_count: RatingSummary.ratings_count + 1,
+            RatingSummary.ratings_total: RatingSummary.ratings_total + stars,
+            stars_column: stars_column + 1
+        })
+
+    if not db.session.execute(statement).rowcount:
+        try:
+            with db.session.begin_nested():
+                summary = RatingSummary(business_id=business_id, ratings_count=1, ratings_total=stars)
+                for value in RATING_VALUES:
+                    setattr(summary, f"stars_{value}", 1 if value == stars else 0)
+                db.session.add(summary)
+        except IntegrityError:
+            # A concurrent request created the summary first
+            db.session.execute(statement)
+
+    return db.session.get(RatingSummary, business_id, populate_existing=True)
+
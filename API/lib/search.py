@@ -0,0 +1,136 @@
+import re
+from typing import Optional
+
+from sqlalchemy import func, or_, literal, text as sql_text
+
+from API import db
+from API.models import Service, Business, ServiceCategories
+
+# pg_trgm similarity a service or business name needs to match a misspelt query. Applied to the `%` operator
+# through pg_trgm.similarity_threshold, so the trigram indexes still serve the match
+TYPO_SIMILARITY: float = 0.3
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def query_tokens(query: str) -> list:
+    """
+        Words of a search query, lower-cased. Punctuation is dropped so tokens are safe inside a tsquery
+        :param query: Raw search text
+        :return: List of tokens
+    """
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def service_document():
+    """tsvector over the service name and description. Must match the ix_services_search expression"""
+    return func.to_tsvector("simple", func.coalesce(Service.service, "") + " " + func.coalesce(Service.description, ""))
+
+
+def business_document():
+    """tsvector over the business name. Must match the ix_businesses_search expression"""
+    return func.to_tsvector("simple", Business.business_name)
+
+
+def _listed_services(city: Optional[str], category_id: Optional[int]):
+    """Services of listed businesses with the optional filters applied"""
+    query = db.session.query(Service, Business, ServiceCategories.category_name) \
+        .join(Business, Service.business_id == Business.id) \
+        .outerjoin(ServiceCategories, Service.service_category == ServiceCategories.id) \
+        .filter(
+            Business.active.is_(True),
+            Business.verified.is_(True),
+            Business.profile_completed.is_(True)
+        )
+    if city:
+        query = query.filter(func.lower(Business.city) == city.strip().lower())
+    if category_id is not None:
+        query = query.filter(Service.service_category == category_id)
+    return query
+
+
+def _postgres_search(tokens: list, city: Optional[str], category_id: Optional[int], limit: int) -> list:
+    """Ranked with ts_rank over the GIN indexed documents; pg_trgm similarity catches typos"""
+    text: str = " ".join(tokens)
+    ts_query = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+    service_name = func.lower(Service.service)
+    business_name = func.lower(Business.business_name)
+
+    # Scoped to the current transaction, so other queries on the connection keep the default threshold
+    db.session.execute(
+        sql_text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+        {"threshold": str(TYPO_SIMILARITY)}
+    )
+
+    rank = func.ts_rank(service_document(), ts_query) * 2 \
+        + func.ts_rank(business_document(), ts_query) \
+        + func.similarity(service_name, text) \
+        + func.similarity(business_name, text) * 0.5
+
+    rows = _listed_services(city, category_id) \
+        .add_columns(rank.label("rank")) \
+        .filter(or_(
+            service_document().op("@@")(ts_query),
+            business_document().op("@@")(ts_query),
+            service_name.op("%")(text),
+            business_name.op("%")(text),
+            func.lower(ServiceCategories.category_name).like(f"{tokens[0]}%")
+        )) \
+        .order_by(rank.desc(), Service.id) \
+        .limit(limit) \
+        .all()
+    return [(service, business, category, float(score)) for service, business, category, score in rows]
+
+
+def _fallback_search(tokens: list, city: Optional[str], category_id: Optional[int], limit: int) -> list:
+    """
+        Databases without tsvector (SQLite): every token must appear in one of the searched fields.
+        Ranked in Python by where the tokens matched. No typo tolerance.
+    """
+    query = _listed_services(city, category_id)
+    for token in tokens:
+        pattern: str = f"%{token}%"
+        query = query.filter(or_(
+            func.lower(Service.service).like(pattern),
+            func.lower(func.coalesce(Service.description, literal(""))).like(pattern),
+            func.lower(Business.business_name).like(pattern),
+            func.lower(func.coalesce(ServiceCategories.category_name, literal(""))).like(pattern)
+        ))
+
+    results: list = []
+    for service, business, category in query.all():
+        weighted_fields: tuple = (
+            (3, service.service or ""),
+            (2, business.business_name or ""),
+            (2, category or ""),
+            (1, service.description or "")
+        )
+        score: float = 0
+        for token in tokens:
+            for weight, field in weighted_fields:
+                words: list = query_tokens(field)
+                if token in words:
+                    score += weight
+                elif any(word.startswith(token) for word in words):
+                    score += weight / 2
+        results.append((service, business, category, score))
+
+    results.sort(key=lambda result: (-result[3], result[0].id))
+    return results[:limit]
+
+
+def search_services(query: str, city: Optional[str] = None, category_id: Optional[int] = None,
+                    limit: int = 20) -> list:
+    """
+        Ranked search over service names, descriptions, business names and service categories
+        :param query: Search text. Every word is matched as a prefix
+        :param city: Only businesses in this city
+        :param category_id: Only services in this service category
+        :param limit: Maximum number of results
+        :return: [(Service, Business, category_name, score)], best match first
+    """
+    tokens: list = query_tokens(query)
+    if not tokens:
+        return []
+    if db.session.get_bind().dialect.name == "postgresql":
+        return _postgres_search(tokens, city, category_id, limit)
+    return _fallback_search(tokens, city, category_id, limit)
@@ -2,6 +2,10 @@ import requests
 import json
 import os
 
+from API.lib.providers import http_session
+
+SMS_URL: str = 'https://isms.celcomafrica.com/api/services/sendsms/'
+
 
 def send_sms(phone: str, message: str) -> requests.Response:
     """
@@ -10,9 +14,6 @@ def send_sms(phone: str, message: str) -> requests.Response:
         :param message: Message being sent
         :return: None
     """
-    url: str = 'https://isms.celcomafrica.com/api/services/sendsms/'
-    headers: dict = {'Content-Type': 'application/json'}
-
     post_data: dict = {
         'partnerID': os.getenv("CELCOM_PARTNER_ID"),
         'apikey':  os.getenv("CELCOM_API_KEY"),
@@ -22,6 +23,7 @@ def send_sms(phone: str, message: str) -> requests.Response:
         'pass_type': 'plain'
     }
 
+    headers: dict = {'Content-Type': 'application/json'}
     payload: str = json.dumps(post_data)
-    response: requests.Response = requests.post(url, headers=headers, data=payload)
+    response: requests.Response = http_session().post(SMS_URL, headers=headers, data=payload)
     return response
@@ -1,23 +1,23 @@
-import json
 import uuid
 import logging
 from datetime import datetime, date as dt_date, time as dt_time
 from flask_mail import Message
-from API import mail, db
+from API import mail_transport, email_templates, db
+from API.lib.mail_transport import MailTransportUnavailable
 from API.models import FailedNotification
-from flask import render_template
 
 
 def log_failed_notification(recipient, notification_type, message_params, error):
     """
     Log a failed notification to the database.
+    message_params is stored as is; the column is already JSON.
     """
     try:
         failed_notification = FailedNotification(
             id=str(uuid.uuid4()),
             recipient=recipient,
             notification_type=notification_type,
-            message_params=json.dumps(message_params),
+            message_params=message_params,
             error_message=str(error)
         )
         db.session.add(failed_notification)
@@ -35,8 +35,8 @@ def send_otp(recipient, otp, name):
     """
     try:
         message = Message("[Action Required]: Verify Account - PAMBA", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template("otp.html", name=name, code=otp)
-        mail.send(message)
+        message.html = email_templates.render("otp.html", name=name, code=otp)
+        mail_transport.send(message)
     except:
         return False
     else:
@@ -54,8 +54,8 @@ def send_reset_email(recipient, token, name):
     try:
         reset_url = f"https://www.pamba.africa/reset-password/{token}"
         message = Message("Reset Password - PAMBA", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template("reset.html", url=reset_url, name=name)
-        mail.send(message)
+        message.html = email_templates.render("reset.html", url=reset_url, name=name)
+        mail_transport.send(message)
     except Exception:
         return False
     else:
@@ -72,8 +72,8 @@ def sent_client_reset_token(recipient: str, url: str, name: str) -> None:
     """
     try:
         message = Message("Reset Password - PAMBA", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template("clientReset.html", url=url, name=name)
-        mail.send(message)
+        message.html = email_templates.render("clientReset.html", url=url, name=name)
+        mail_transport.send(message)
     except:
         return False
     else:
@@ -91,8 +91,8 @@ def business_account_activation_email(recipient: str, token: str, name: str) ->
     try:
         url = f"https://www.pamba.africa/verify/{token}"
         message = Message("[Action Required]: Activate your Pamba account", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template("activatebusiness.html", name=name, url=url)
-        mail.send(message)
+        message.html = email_templates.render("activatebusiness.html", name=name, url=url)
+        mail_transport.send(message)
     except Exception:
         return False
     else:
@@ -108,10 +108,15 @@ def appointment_confirmation_email(
     latitude,                 
     longitude,               
     place_id,
-    recipient
+    recipient,
+    log_failure=True,
+    connection=None
 ):
     """
     Send email notification for successful appointment booking
+    log_failure=False leaves retrying to the caller instead of queueing a FailedNotification
+    connection: open SMTP connection to reuse across a batch. Defaults to a pooled one.
+        With a connection, MailTransportUnavailable is raised instead of returning False
     """
     # Construct Google Maps Directions URL
     if latitude and longitude and place_id:
@@ -124,7 +129,7 @@ def appointment_confirmation_email(
 
     try:
         message = Message("Pamba - New Appointment", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template(
+        message.html = email_templates.render(
             "confirmAppointment.html",
             name=client_name if client_name else None,
             appointment_date=date_str,
@@ -133,8 +138,13 @@ def appointment_confirmation_email(
             business_address=business_address,
             business_direction=directions_url
         )
-        mail.send(message) 
+        (connection or mail_transport).send(message)
     except Exception as e:
+        if connection is not None and isinstance(e, MailTransportUnavailable):
+            # The batch owning the connection reschedules everything left
+            raise
+        if not log_failure:
+            return False
         log_failed_notification(
             recipient=recipient,
             notification_type="appointment_confirmation",
@@ -155,25 +165,32 @@ def appointment_confirmation_email(
         return True
 
 
-def send_ask_for_review_mail(url, name, business_name, recipient):
+def send_ask_for_review_mail(url, name, business_name, recipient, log_failure=True, connection=None):
     """
         Ask clients to review
         :param url: Review url
         :param name: client name if any
         :param business_name: Name of Business
         :param recipient: Client Email
+        :param log_failure: Queue a FailedNotification for the resend task if sending fails
+        :param connection: Open SMTP connection to reuse. Defaults to a pooled one.
+            With a connection, MailTransportUnavailable is raised instead of returning False
         :return:
     """
     try:
         message = Message("Pamba - Review your Appointment", sender="pamba.africa", recipients=[recipient])
-        message.html = render_template(
+        message.html = email_templates.render(
             "askForReview.html",
             url=url,
             name=name,
             business_name=business_name
         )
-        mail.send(message)
+        (connection or mail_transport).send(message)
     except Exception as e:
+        if connection is not None and isinstance(e, MailTransportUnavailable):
+            raise
+        if not log_failure:
+            return False
         log_failed_notification(
             recipient=recipient,
             notification_type="ask_for_review",
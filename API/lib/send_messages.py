@@ -1,36 +1,43 @@
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from requests import RequestException
 import os
 
+from API.lib.providers import twilio_client
 
-def whatsapp_appointment_reminder(recipient, business, service, date, time):
+
+def whatsapp_reminder_message(business, service, date, time):
     """
-        Remind the client of their upcoming appointment via whatsapp
-        :param recipient: Client's whatsapp number
+        Compose the whatsapp appointment reminder
         :param business: The shop where the appointment is booked
         :param service: Appointment service
         :param date: Appointment Date
         :param time: Appointment time
-        :return:
+        :return: Message
     """
-    account_sid = os.getenv("TWILIO_SID")
-    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-    twilio_number = os.getenv("TWILIO_NUMBER")
-    message = f"""
+    return f"""
 Hello there 👋,\n
 Just a friendly reminder about your upcoming {service} appointment with {business} on {date.strftime("%d-%b-%Y")} at {time.strftime("%I:%M %p")}.
 Thank you.
 \nRegards,
 Pamba Africa
     """
-    client = Client(account_sid, auth_token)
+
+
+def send_whatsapp(recipient, message):
+    """
+        Send a whatsapp message through Twilio
+        :param recipient: Client's whatsapp number
+        :param message: Message being sent
+        :return: True if Twilio accepted it
+    """
+    twilio_number = os.getenv("TWILIO_NUMBER")
     try:
-        client.messages.create(
+        twilio_client().messages.create(
             body=message,
             from_=twilio_number,
             to="whatsapp:"+recipient
         )
-    except TwilioRestException:
+    except (TwilioRestException, RequestException):
         return False
     else:
         return True
@@ -0,0 +1,195 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta, time
+from itertools import accumulate
+from typing import Iterable, Optional, Union
+
+from sqlalchemy.exc import IntegrityError
+
+from API import db
+from API.models import Appointment, Service, StaffAvailability
+
+Interval = tuple[datetime, datetime]
+
+# Exclusion constraint on appointments that rejects overlapping bookings for the same staff member (Postgres)
+STAFF_OVERLAP_CONSTRAINT: str = "appointments_staff_no_overlap"
+
+
+def hours_to_minutes(estimated_service_time: Optional[Union[str, float]]) -> int:
+    """
+        Convert an estimated service time given in decimal hours to whole minutes
+        :param estimated_service_time: Estimated service time e.g. 1.5
+        :return: Number of minutes e.g. 90
+    """
+    if not estimated_service_time:
+        return 0
+    return int(float(estimated_service_time) * 60)
+
+
+def service_duration(service: Optional[Service]) -> timedelta:
+    """
+        How long a service takes
+        :param service: Service
+        :return: Duration of the service
+    """
+    if not service:
+        return timedelta(0)
+    if service.duration_minutes is None:
+        return timedelta(minutes=hours_to_minutes(service.estimated_service_time))
+    return timedelta(minutes=service.duration_minutes)
+
+
+def appointment_ends_at(appointment_date: date, appointment_time: time, service: Optional[Service]) -> datetime:
+    """
+        Calculate when an appointment ends
+        :param appointment_date: Date of the appointment
+        :param appointment_time: Time of the appointment
+        :param service: Service booked
+        :return: End of the appointment
+    """
+    if isinstance(appointment_date, datetime):
+        appointment_date = appointment_date.date()
+    return datetime.combine(appointment_date, appointment_time) + service_duration(service)
+
+
+def is_staff_overlap_error(error: IntegrityError) -> bool:
+    """
+        Check whether an IntegrityError was raised by the staff overlap exclusion constraint
+        :param error: Error raised on commit
+        :return: True if a concurrent booking already holds the staff member's time slot
+    """
+    return STAFF_OVERLAP_CONSTRAINT in str(error.orig)
+
+
+class IntervalIndex:
+    """
+        Sorted, possibly overlapping, [start, end) intervals.
+        Starts are kept sorted next to a running maximum of the end times so that an overlap query
+        is a single binary search instead of a scan.
+    """
+
+    def __init__(self, intervals: Iterable[Interval]):
+        self.intervals: list = sorted(intervals)
+        self._starts: list = [start for start, _ in self.intervals]
+        self._max_ends: list = list(accumulate((end for _, end in self.intervals), max))
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """
+            Check whether [start, end) overlaps any interval in the index.
+            A zero length query (start == end) checks whether that instant falls inside an interval.
+            :param start: Start of the queried interval
+            :param end: End of the queried interval
+            :return: True if there is an overlap
+        """
+        if end > start:
+            position: int = bisect_left(self._starts, end)
+        else:
+            position = bisect_right(self._starts, start)
+        return position > 0 and self._max_ends[position - 1] > start
+
+
+class StaffSchedule:
+    """
+        Busy periods of one staff member on one day: booked appointments and unavailability blocks.
+    """
+
+    def __init__(self, staff_id: int, day: date, appointments: Iterable[Interval], blocks: Iterable[Interval]):
+        self.staff_id: int = staff_id
+        self.day: date = day
+        self.booked: IntervalIndex = IntervalIndex(appointments)
+        self.blocked: IntervalIndex = IntervalIndex(blocks)
+
+    @classmethod
+    def load(cls, staff_id: int, day: date, exclude_appointment_id: Optional[int] = None) -> "StaffSchedule":
+        """
+            Load the schedule for a staff member on a given day
+            :param staff_id: ID of the staff
+            :param day: Day of the schedule
+            :param exclude_appointment_id: Appointment to leave out, e.g. the one being rescheduled
+            :return: StaffSchedule
+        """
+        if isinstance(day, datetime):
+            day = day.date()
+        schedules: dict = cls.load_range([staff_id], day, day, exclude_appointment_id)
+        return schedules[(staff_id, day)]
+
+    @classmethod
+    def load_range(
+            cls,
+            staff_ids: list,
+            start_day: date,
+            end_day: date,
+            exclude_appointment_id: Optional[int] = None) -> dict:
+        """
+            Load the schedules of several staff members over a range of days in one pass.
+            :param staff_ids: IDs of the staff
+            :param start_day: First day, inclusive
+            :param end_day: Last day, inclusive
+            :param exclude_appointment_id: Appointment to leave out, e.g. the one being rescheduled
+            :return: {(staff_id, day): StaffSchedule} for every staff member and day in the range
+        """
+        appointments: dict = defaultdict(list)
+        blocks: dict = defaultdict(list)
+
+        if staff_ids:
+            appointments_query = db.session.query(
+                Appointment.staff_id, Appointment.date, Appointment.time, Appointment.ends_at
+            ) \
+                .filter(
+                    Appointment.staff_id.in_(staff_ids),
+                    Appointment.date >= start_day,
+                    Appointment.date <= end_day,
+                    ~Appointment.cancelled
+                )
+            if exclude_appointment_id is not None:
+                appointments_query = appointments_query.filter(Appointment.id != exclude_appointment_id)
+
+            blocks_query = db.session.query(
+                StaffAvailability.staff_id, StaffAvailability.date, StaffAvailability.start_time, StaffAvailability.end_time
+            ) \
+                .filter(
+                    StaffAvailability.staff_id.in_(staff_ids),
+                    StaffAvailability.date >= start_day,
+                    StaffAvailability.date <= end_day
+                )
+
+            for staff_id, day, start_time, ends_at in appointments_query:
+                start: datetime = datetime.combine(day, start_time)
+                appointments[(staff_id, day)].append((start, ends_at or start))
+
+            for staff_id, day, start_time, end_time in blocks_query:
+                blocks[(staff_id, day)].append((datetime.combine(day, start_time), datetime.combine(day, end_time)))
+
+        schedules: dict = {}
+        for offset in range((end_day - start_day).days + 1):
+            day: date = start_day + timedelta(days=offset)
+            for staff_id in staff_ids:
+                schedules[(staff_id, day)] = cls(
+                    staff_id, day, appointments.get((staff_id, day), ()), blocks.get((staff_id, day), ())
+                )
+        return schedules
+
+    def is_booked(self, start: datetime, end: datetime) -> bool:
+        """Check if [start, end) overlaps a booked appointment"""
+        return self.booked.overlaps(start, end)
+
+    def is_blocked(self, start: datetime, end: datetime) -> bool:
+        """Check if [start, end) overlaps an unavailability block"""
+        return self.blocked.overlaps(start, end)
+
+    def is_busy(self, start: datetime, end: datetime) -> bool:
+        """Check if [start, end) overlaps either an appointment or an unavailability block"""
+        return self.is_booked(start, end) or self.is_blocked(start, end)
+
+    def is_free_at(self, start_time: time, duration: timedelta) -> bool:
+        """
+            Check if the staff member can take a booking starting at start_time on this day
+            :param start_time: Time of the booking
+            :param duration: How long the booking takes
+            :return: True if free
+        """
+        start: datetime = datetime.combine(self.day, start_time)
+        return not self.is_busy(start, start + duration)
@@ -1,5 +1,7 @@
 from datetime import timedelta, datetime, date, time
-from API.models import Staff, Appointment, Service
+from typing import Optional
+from API.models import Staff, Service
+from API.lib.staff_schedule import StaffSchedule, service_duration
 from werkzeug.utils import secure_filename
 import secrets
 import os
@@ -73,40 +75,22 @@ def add_decimal_hours_to_time(base_time: time, decimal_hours: float) -> time:
     return new_time
 
 
-def check_staff_availability(staff: Staff, service: Service, appointment_date: date, appointment_time: time) -> bool:
+def check_staff_availability(
+        staff: Staff,
+        service: Optional[Service],
+        appointment_date: date,
+        appointment_time: time,
+        exclude_appointment_id: Optional[int] = None) -> bool:
     """
         Check if a certain staff member is available for an appointment.
         :param staff: Staff object.
         :param service: Service being Booked.
         :param appointment_date: Appointment Date.
         :param appointment_time: Time of the appointment.
-        :return:
+        :param exclude_appointment_id: Appointment to ignore, used when rescheduling.
+        :return: True if the new appointment overlaps an existing booking or unavailability period.
     """
-    overlap: bool = False
-
-    # Check if the staff is booked at the selected time slot
-    current_date: date = datetime.now().date()
-    upcoming_staffs_appointments: list = staff.appointments \
-        .filter(Appointment.date >= current_date, ~Appointment.cancelled).all()
-    for appointment in upcoming_staffs_appointments:
-        if appointment.date == appointment_date:  # Rethink this part #025
-            appointment_duration: float = appointment.service.estimated_service_time
-            appointment_start: datetime = datetime.combine(appointment.date, appointment.time)
-            appointment_end: datetime = appointment_start + timedelta(minutes=int(float(appointment_duration) * 60))
-
-            new_appointment_duration: float = service.estimated_service_time
-            new_appointment_start: datetime = datetime.combine(appointment_date, appointment_time)
-            new_appointment_end: datetime = new_appointment_start + timedelta(minutes=int(float(new_appointment_duration) * 60))
-
-            # Check overlapping appointments
-            overlap = (new_appointment_start < appointment_end) and (new_appointment_end > appointment_start)
-
-            # Check if the start and end times of the old interval fall within the new interval
-            overlap |= (appointment_start >= new_appointment_start and appointment_end <= new_appointment_end)
-
-            # Check if the start time of the new interval falls within the old interval's time range
-            overlap |= (appointment_start <= new_appointment_start < appointment_end)
-            if overlap:
-                break
-    return overlap
-
+    schedule: StaffSchedule = StaffSchedule.load(staff.id, appointment_date, exclude_appointment_id)
+    new_appointment_start: datetime = datetime.combine(schedule.day, appointment_time)
+    new_appointment_end: datetime = new_appointment_start + service_duration(service)
+    return schedule.is_busy(new_appointment_start, new_appointment_end)
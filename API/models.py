@@ -110,6 +110,7 @@ class Service(db.Model):
     price = db.Column(db.Integer)
     description = db.Column(db.Text)
     estimated_service_time = db.Column(db.String(100), nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=True)  # estimated_service_time in whole minutes
     service_image = db.Column(db.String(100), nullable=True)
     business_id = db.Column(db.Integer, db.ForeignKey("businesses.id"))
     service_category = db.Column(db.Integer, db.ForeignKey("service_categories.id",  ondelete='SET NULL'))
@@ -123,6 +124,9 @@ class Service(db.Model):
 class Sale(db.Model):
     """Business Sales"""
     __tablename__ = "sales"
+    __table_args__ = (
+        db.Index("ix_sales_business_id_date_created", "business_id", "date_created"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     payment_method = db.Column(db.String(30), nullable=False)
@@ -130,6 +134,7 @@ class Sale(db.Model):
     date_created = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     business_id = db.Column(db.Integer, db.ForeignKey("businesses.id"))
     service_id = db.Column(db.Integer, db.ForeignKey("services.id", ondelete='SET NULL'))
+    price = db.Column(db.Integer, nullable=True)  # Service price when the sale was made
 
     def __repr__(self):
         return f"Sales({self.date_created}, {self.payment_method})"
@@ -152,6 +157,9 @@ class ExpenseAccount(db.Model):
 class Expense(db.Model):
     """Businesses Expenses"""
     __tablename__ = "expenses"
+    __table_args__ = (
+        db.Index("ix_expenses_business_id_created_at", "business_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     expense = db.Column(db.String(100), nullable=False)
@@ -166,6 +174,24 @@ class Expense(db.Model):
         return f"Expense({self.expense})"
 
 
+class DailyBusinessMetric(db.Model):
+    """
+        Per business, per day rollup of sales, expenses and completed appointments.
+        Maintained incrementally by the write paths in API.lib.metrics, backfilled by its migration and rebuilt with `flask rebuild-metrics`
+    """
+    __tablename__ = "daily_business_metrics"
+
+    business_id = db.Column(db.Integer, db.ForeignKey("businesses.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+    expense_total = db.Column(db.Integer, nullable=False, default=0)
+    appointments_completed = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"DailyBusinessMetric({self.business_id}, {self.day})"
+
+
 class BusinessNotification(db.Model):
     """Notifications sent to the businesses"""
     __tablename__ = "business_notifications"
@@ -220,6 +246,9 @@ class StaffAvailability(db.Model):
 class Inventory(db.Model):
     """Business Inventory"""
     __tablename__ = "inventory"
+    __table_args__ = (
+        db.Index("ix_inventory_business_id_id", "business_id", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product = db.Column(db.String(50), nullable=False)
@@ -234,6 +263,9 @@ class Inventory(db.Model):
 class Rating(db.Model):
     """Business Ratings"""
     __tablename__ = "ratings"
+    __table_args__ = (
+        db.Index("ix_ratings_business_id", "business_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)
@@ -244,6 +276,39 @@ class Rating(db.Model):
         return f"Rating({self.rating})"
 
 
+class RatingSummary(db.Model):
+    """
+        Per business rating aggregates: count, sum and a 1-5 histogram.
+        Updated in the same transaction as each new Rating by API.lib.rating_calculator.record_rating
+    """
+    __tablename__ = "rating_summaries"
+
+    business_id = db.Column(db.Integer, db.ForeignKey("businesses.id", ondelete="CASCADE"), primary_key=True)
+    ratings_count = db.Column(db.Integer, nullable=False, default=0)
+    ratings_total = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average(self):
+        """Rounded average rating, None if the business has no ratings"""
+        if not self.ratings_count:
+            return None
+        return round(self.ratings_total / self.ratings_count)
+
+    @property
+    def breakdown(self) -> dict:
+        """Number of ratings per star value. Values nobody gave are left out"""
+        counts: dict = {stars: getattr(self, f"stars_{stars}") for stars in range(1, 6)}
+        return {stars: count for stars, count in counts.items() if count}
+
+    def __repr__(self):
+        return f"RatingSummary({self.business_id}, {self.ratings_count})"
+
+
 # ------------------------------------------------------------- CLIENTS ---------------------------------------------
 
 
@@ -263,6 +328,7 @@ class Client(db.Model):
     join_date = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     dob = db.Column(db.Date, nullable=True)
     profile_image = db.Column(db.String(200), nullable=True)
+    notification_channel = db.Column(db.String(20), nullable=True)  # Preferred channel for appointment messages
     notifications = db.relationship("ClientNotification", backref="client", lazy="dynamic", cascade="all, "
                                                                                                     "delete-orphan")
     reviews = db.relationship("Review", backref="client", lazy="dynamic", cascade="all, delete-orphan")
@@ -275,6 +341,9 @@ class Client(db.Model):
 class ClientNotification(db.Model):
     """Notifications sent to Clients"""
     __tablename__ = "clientsnotitications"
+    __table_args__ = (
+        db.Index("ix_clientsnotitications_client_id_id", "client_id", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(50), nullable=False)
@@ -308,6 +377,9 @@ class ClientDeleted(db.Model):
 class Review(db.Model):
     """Customer Reviews"""
     __tablename__ = "reviews"
+    __table_args__ = (
+        db.Index("ix_reviews_business_id_id", "business_id", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.Text, nullable=True)
@@ -323,10 +395,17 @@ class Review(db.Model):
 class Appointment(db.Model):
     """Appointments table"""
     __tablename__ = "appointments"
+    __table_args__ = (
+        db.Index("ix_appointments_business_id_date_cancelled", "business_id", "date", "cancelled"),
+        db.Index("ix_appointments_staff_id_date", "staff_id", "date"),
+        db.Index("ix_appointments_client_id_date", "client_id", "date"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
+    # When the appointment ends. Postgres excludes overlapping (date + time, ends_at) ranges per staff member.
+    ends_at = db.Column(db.DateTime, nullable=True)
     completed = db.Column(db.Boolean, default=False)
     cancelled = db.Column(db.Boolean, default=False)
     comment = db.Column(db.Text, nullable=True)
@@ -352,8 +431,24 @@ class FailedNotification(db.Model):
     error_message = db.Column(db.Text, nullable=True)
     retry_count = db.Column(db.Integer, default=0)
     max_retries = db.Column(db.Integer, default=3)
+    # The resend task only claims rows that are due
+    next_attempt_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
     def __repr__(self):
         return f"<FailedNotification {self.notification_type} for {self.recipient}>"
+
+
+class NotificationDispatch(db.Model):
+    """
+        Idempotency keys of notifications that have been sent, so a retried or redelivered task sends only once
+    """
+    __tablename__ = "notification_dispatches"
+
+    key = db.Column(db.String(200), primary_key=True)
+    notification_type = db.Column(db.String(50), nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC
+
+    def __repr__(self):
+        return f"NotificationDispatch({self.key})"
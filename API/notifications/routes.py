@@ -3,6 +3,7 @@ from API.models import ClientNotification, BusinessNotification
 from API.lib.auth import client_login_required, business_login_required
 from API import db
 from API.lib.data_serializer import serialize_notification
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 
 notifications_blueprint = Blueprint("notifications", __name__, url_prefix="/API/notifications")
 
@@ -84,17 +85,23 @@ def delete_notification(client, notification_id):
 @client_login_required
 def fetch_all(client):
     """
-        Fetch all notifications
+        Fetch the client's notifications, newest first, one page at a time
         :param client:
-        :return: 200
+        :return: 200, 400
     """
-    notifications = ClientNotification.query.filter_by(client_id=client.id).all()
+    cursor, limit = page_args()
+    query = ClientNotification.query.filter_by(client_id=client.id)
+    try:
+        notifications, next_cursor = keyset_paginate(query, (ClientNotification.id,), cursor, limit)
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
+
     all_notifications = []
 
     for notification in notifications:
         all_notifications.append(serialize_notification(notification))
 
-    return jsonify({"notifications": all_notifications}), 200
+    return jsonify({"notifications": all_notifications, "nextCursor": next_cursor}), 200
 
 
 # ------------------------------- BUSINESSES NOTIFICATIONS ---------------------------------------- #
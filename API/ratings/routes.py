@@ -1,8 +1,10 @@
 from flask import jsonify, request, Blueprint
 
-from API.lib.rating_calculator import calculate_ratings
-from API.models import Rating, Business
+from API.lib.rating_calculator import record_rating, RATING_VALUES
+from API.models import Rating, RatingSummary, Business
 from API import db
+from API.helpers import invalidate_business_profile
+from API.lib.discovery_index import discovery_index
 from API.lib.auth import verify_api_key
 
 ratings_blueprint = Blueprint("rating", __name__, url_prefix="/API/ratings")
@@ -16,26 +18,44 @@ def add_rating():
         :return: 200
     """
     payload = request.get_json()
-    rating = payload["rating"]
     business_id = payload["businessID"]
+    stars = payload["rating"]
+    if isinstance(stars, str) and stars.strip().isdigit():
+        stars = int(stars)
+
+    # bool is an int subclass; 4.5 or True must not be accepted as a star count
+    if type(stars) is not int or stars not in RATING_VALUES:
+        return jsonify({"message": "Rating must be between 1 and 5"}), 400
 
     business = Business.query.get(business_id)
     if not business:
         return jsonify({"message": "Business doesn't exist"}), 404
 
-    rating = Rating(
-        rating=rating,
-        business_id=business_id
-    )
-    # Calculate the rating score for the business. Add to the Business's rating field.
-    ratings = Rating.query.filter_by(business_id=business.id).all()
-    if ratings:
-        rating_score, _ = calculate_ratings(ratings=ratings, breakdown=True)
-    else:
-        rating_score = 0
-
-    db.session.add(rating)
-    business.rating = rating_score
+    db.session.add(Rating(rating=stars, business_id=business.id))
+    summary = record_rating(business.id, stars)
+    business.rating = summary.average
     db.session.commit()
+    invalidate_business_profile(business.slug)
+    discovery_index.refresh(business.id)
 
     return jsonify({"message": "Rating has been posted"}), 200
+
+
+@ratings_blueprint.route("/<int:business_id>", methods=["GET"])
+@verify_api_key
+def rating_summary(business_id):
+    """
+        Average and breakdown of a business's ratings, served from the rating summary
+        :param business_id: ID of the business
+        :return: 404, 200
+    """
+    business = Business.query.get(business_id)
+    if not business:
+        return jsonify({"message": "Business doesn't exist"}), 404
+
+    summary = RatingSummary.query.get(business_id)
+    return jsonify({
+        "ratingsAverage": summary.average if summary else None,
+        "ratingsBreakdown": summary.breakdown if summary else None,
+        "ratingsCount": summary.ratings_count if summary else 0
+    }), 200
@@ -3,7 +3,11 @@ import time
 from API.lib.data_serializer import serialize_review
 from API.models import Review, Appointment, Business
 from API import db
+from API.helpers import invalidate_business_profile
+from API.lib.discovery_index import discovery_index
 from API.lib.auth import verify_api_key
+from API.lib.query_options import review_list_options
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 
 reviews_blueprint = Blueprint("reviews", __name__, url_prefix="/API/reviews")
 
@@ -32,6 +36,8 @@ def create_review(appointment_id):
     )
     db.session.add(review)
     db.session.commit()
+    invalidate_business_profile(appointment.business.slug)
+    discovery_index.refresh(appointment.business_id)
 
     return jsonify({"message": "Review has been posted"}), 200
 
@@ -40,15 +46,22 @@ def create_review(appointment_id):
 @verify_api_key
 def list_reviews(slug):
     """
-        List Reviews for a give business slug
+        List Reviews for a give business slug, newest first, one page at a time
         :param slug: Business slug
-        :return:
+        :return: 200, 400
     """
     business = Business.query.filter_by(slug=slug).first()
     if not business:
         return jsonify({"message": "Shop doesn't exist"}), 400
 
-    reviews = business.reviews.all()
+    cursor, limit = page_args()
+    try:
+        reviews, next_cursor = keyset_paginate(
+            business.reviews.options(*review_list_options()), (Review.id,), cursor, limit
+        )
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
+
     serialized_reviews = []
     for review in reviews:
         serializer = serialize_review(review)
@@ -56,6 +69,6 @@ def list_reviews(slug):
         serializer["rating"] = 3
         serialized_reviews.append(serializer)
 
-    return jsonify({"reviews": serialized_reviews}), 200
+    return jsonify({"reviews": serialized_reviews, "nextCursor": next_cursor}), 200
 
 
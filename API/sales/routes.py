@@ -1,12 +1,19 @@
 from datetime import datetime, timedelta, date
-from API.models import Sale, Service
+from sqlalchemy import func, case
+from API.models import Sale, DailyBusinessMetric
 from flask import Blueprint, jsonify, request
 from API import db
 from API.lib.auth import business_login_required, business_verification_required
 from API.lib.data_serializer import serialize_sale
+from API.lib.metrics import track_sale
+from API.lib.query_options import sale_list_options
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 
 sales_blueprint = Blueprint("sales", __name__, url_prefix="/API/sales")
 
+SALES_PAGE_SIZE = 50
+MAX_SALES_PAGE_SIZE = 200
+
 
 @sales_blueprint.route("/add-sale", methods=["POST"])
 @business_login_required
@@ -22,7 +29,7 @@ def record_sale(business):
     description = payload["description"].strip()
     service_id = payload["serviceId"]
 
-    business_services = [service.id for service in business.services.all()]
+    business_services = {service.id: service for service in business.services.all()}
     if service_id not in business_services:
         return jsonify({"message": "We are not offering this service at the moment"}), 400
 
@@ -30,10 +37,13 @@ def record_sale(business):
         payment_method=payment_method,
         description=description,
         service_id=service_id,
-        business_id=business.id
+        business_id=business.id,
+        price=business_services[service_id].price
     )
 
     db.session.add(sale)
+    db.session.flush()
+    track_sale(sale)
     db.session.commit()
 
     return jsonify({"message": "Sale Added", "newSale": serialize_sale(sale)}), 200
@@ -44,12 +54,17 @@ def record_sale(business):
 @business_verification_required
 def fetch_all_business_sales(business):
     """
-        Fetch all the sales for a given business
+        Fetch the sales for a given business, newest first, one page at a time
         :param business: Business
-        :return:
+        :return: 200, 400
     """
+    cursor, limit = page_args()
+    query = Sale.query.options(*sale_list_options()).filter_by(business_id=business.id)
+    try:
+        sales, next_cursor = keyset_paginate(query, (Sale.date_created, Sale.id), cursor, limit)
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
 
-    sales: list = Sale.query.filter_by(business_id=business.id).all()
     all_sales: list = []
 
     for sale in sales:
@@ -58,7 +73,7 @@ def fetch_all_business_sales(business):
         sale_info["service_id"] = sale.service.id
         all_sales.append(sale_info)
 
-    return jsonify({"message": "Sales", "sales": all_sales})
+    return jsonify({"message": "Sales", "sales": all_sales, "nextCursor": next_cursor})
 
 
 @sales_blueprint.route("/delete/<int:sale_id>", methods=["DELETE"])
@@ -80,6 +95,7 @@ def delete_sale(business, sale_id):
     if business.id != sale.business_id:
         return jsonify({"message": "Not allowed"}), 400
 
+    track_sale(sale, sign=-1)
     db.session.delete(sale)
     db.session.commit()
 
@@ -92,41 +108,49 @@ def delete_sale(business, sale_id):
 def revenue_analytics(business):
     """
         Business Revenue Analysis
+        Totals are read from the daily metrics rollup. lifetime_sales is only returned when requested
+        with ?lifetime=true and is paginated with ?page=&per_page=
         :param business: Logged in Business
         :return: 200
     """
     today: date = datetime.today().date()
-    current_month: int = today.month
-    current_year: int = today.year
-    sales: list = business.sales.all()
+    month_start: date = today.replace(day=1)
     seven_days_ago: date = today - timedelta(days=7)
 
-    lifetime_sales: list = []
-    total_sales: int = 0
-    current_month_revenue: int = 0
-    last_seven_days_sales: int = 0
-
-    for sale in sales:
-        service: Service = sale.service
-        serialized_sale: dict = serialize_sale(sale)
-        serialized_sale["price"] = service.price
-        serialized_sale["service_id"] = service.id
-        lifetime_sales.append(serialized_sale)
-        total_sales += service.price
-        if sale.date_created.date().month == current_month and sale.date_created.date().year == current_year:
-            current_month_revenue += service.price
-        if sale.date_created.date() > seven_days_ago:
-            last_seven_days_sales += service.price
-
-    return jsonify(
-        {
-            "message": "Success",
-            "lifetime_sales": lifetime_sales,
-            "total_sales": total_sales,
-            "current_month_revenue": current_month_revenue,
-            "last_seven_days": last_seven_days_sales
-        }
-    ), 200
+    total_sales, current_month_revenue, last_seven_days_sales = db.session.query(
+        func.coalesce(func.sum(DailyBusinessMetric.revenue), 0),
+        func.coalesce(func.sum(case((DailyBusinessMetric.day >= month_start, DailyBusinessMetric.revenue), else_=0)), 0),
+        func.coalesce(func.sum(case((DailyBusinessMetric.day > seven_days_ago, DailyBusinessMetric.revenue), else_=0)), 0)
+    ) \
+        .filter(DailyBusinessMetric.business_id == business.id) \
+        .one()
+
+    analytics: dict = {
+        "message": "Success",
+        "total_sales": int(total_sales),
+        "current_month_revenue": int(current_month_revenue),
+        "last_seven_days": int(last_seven_days_sales)
+    }
+
+    if request.args.get("lifetime", "").lower() == "true":
+        page: int = request.args.get("page", 1, type=int)
+        per_page: int = min(request.args.get("per_page", SALES_PAGE_SIZE, type=int), MAX_SALES_PAGE_SIZE)
+        sales_page = Sale.query \
+            .filter(Sale.business_id == business.id) \
+            .order_by(Sale.date_created.desc(), Sale.id.desc()) \
+            .paginate(page=page, per_page=per_page, error_out=False)
+
+        lifetime_sales: list = []
+        for sale in sales_page.items:
+            serialized_sale: dict = serialize_sale(sale)
+            serialized_sale["price"] = sale.price
+            serialized_sale["service_id"] = sale.service_id
+            lifetime_sales.append(serialized_sale)
+
+        analytics["lifetime_sales"] = lifetime_sales
+        analytics["pagination"] = {"page": page, "per_page": per_page, "total": sales_page.total}
+
+    return jsonify(analytics), 200
 
 
 @sales_blueprint.route("/edit/<int:sale_id>", methods=["PUT"])
@@ -150,7 +174,9 @@ def edit_sale(business, sale_id):
     
     if business.id != sale.business_id:
         return jsonify({"message": "Not found"}), 400
-    
+
+    track_sale(sale, sign=-1)
+
     if payment_method:
         sale.payment_method = payment_method
     
@@ -158,11 +184,15 @@ def edit_sale(business, sale_id):
         sale.description = description
     
     if service_id:
-        business_services = [service.id for service in business.services.all()]
+        business_services = {service.id: service for service in business.services.all()}
         if service_id not in business_services:
+            db.session.rollback()
             return jsonify({"message": "Service does not exist!"}), 400
-        sale.service_id = service_id
-    
+        if service_id != sale.service_id:
+            sale.service_id = service_id
+            sale.price = business_services[service_id].price
+
+    track_sale(sale)
     db.session.commit()
 
     return jsonify({"message": "Sale updated", "updatedSale": serialize_sale(sale)}), 200
@@ -1,13 +1,25 @@
-import datetime
+from datetime import timedelta
+from typing import Optional
 
-from flask import jsonify, Blueprint, request
+import hashlib
+
+from flask import jsonify, Blueprint, request, Response, current_app, stream_with_context
 from API.models import ServiceCategories, Service, Business
 from API.lib.auth import verify_api_key, business_verification_required,business_login_required
 from API.lib.data_serializer import serialize_service, serialize_staff, serialize_business
-from API import db
+from API import db, cache
+from API.helpers import invalidate_business_profile, CATALOGUE
+from API.lib.discovery_index import discovery_index
+from API.lib.staff_schedule import hours_to_minutes, service_duration
+from API.lib.search import search_services
+from API.lib.pagination import page_args, keyset_paginate, InvalidCursor
 
 services_blueprint = Blueprint("services", __name__, url_prefix="/API/services")
 
+SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 50
+CATALOGUE_STREAM_BATCH = 500
+
 
 @services_blueprint.route("/categories", methods=["GET"])
 @verify_api_key
@@ -28,26 +40,110 @@ def fetch_service_categories():
 @verify_api_key
 def fetch_all_services():
     """
-        Fetch all services
-        :return: 200
+        Fetch all services of listed businesses.
+        ?format=normalized returns {"services": [...], "businesses": {id: business}} one page at a time
+        (?limit=&cursor=), or the whole catalogue as a stream with ?format=normalized&stream=1.
+        With the shared (Redis) cache, responses carry an ETag derived from the catalogue version and
+        If-None-Match gets a 304. Per-process versions would differ between workers and miss other
+        workers' changes, so no ETag is sent without it.
+        :return: 200, 304, 400
     """
-    services = db.session.query(Service, Business) \
+    etag: Optional[str] = None
+    if cache.shared:
+        etag = hashlib.sha1(f"{cache.version(CATALOGUE)}:{request.query_string.decode()}".encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+    query = db.session.query(Service, Business) \
         .join(Business, Service.business_id == Business.id) \
         .filter(
             Business.active.is_(True),
             Business.verified.is_(True),
             Business.profile_completed.is_(True)
-        ) \
-        .order_by(Service.service) \
-        .all()
-        
-    serialized_services = []
-    for service, business in services:
-        serialized = serialize_service(service)
-        serialized_business = serialize_business(business)
-        record = {"serviceInfo": serialized, "businessInfo": serialized_business}
-        serialized_services.append(record)
-    return jsonify({"services": serialized_services}), 200
+        )
+
+    if request.args.get("format") != "normalized":
+        serialized_services = []
+        for service, business in query.order_by(Service.service).all():
+            serialized = serialize_service(service)
+            serialized_business = serialize_business(business)
+            record = {"serviceInfo": serialized, "businessInfo": serialized_business}
+            serialized_services.append(record)
+        response = jsonify({"services": serialized_services})
+    elif request.args.get("stream") == "1":
+        query = query.order_by(Service.service, Service.id).yield_per(CATALOGUE_STREAM_BATCH)
+        response = Response(stream_with_context(stream_catalogue(query)), mimetype="application/json")
+    else:
+        cursor, limit = page_args()
+        try:
+            rows, next_cursor = keyset_paginate(query, (Service.service, Service.id), cursor, limit,
+                                                descending=False, entity=lambda row: row[0])
+        except InvalidCursor:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+        businesses: dict = {}
+        serialized_services = []
+        for service, business in rows:
+            serialized_services.append(serialize_service(service))
+            if business.id not in businesses:
+                businesses[business.id] = serialize_business(business)
+        response = jsonify({"services": serialized_services, "businesses": businesses, "nextCursor": next_cursor})
+
+    if etag:
+        response.set_etag(etag)
+    return response, 200
+
+
+def stream_catalogue(rows):
+    """
+        Emit the normalized catalogue as JSON one service at a time; businesses are written once, at the end
+        :param rows: (Service, Business) rows
+        :return: Generator of JSON chunks
+    """
+    businesses: dict = {}
+    yield '{"services":['
+    for position, (service, business) in enumerate(rows):
+        yield ("," if position else "") + current_app.json.dumps(serialize_service(service))
+        if business.id not in businesses:
+            businesses[business.id] = serialize_business(business)
+    yield '],"businesses":' + current_app.json.dumps(businesses) + "}"
+
+
+@services_blueprint.route("/search", methods=["GET"])
+@verify_api_key
+def search_services_endpoint():
+    """
+        Ranked search over services, business names and categories.
+        ?q=<text>&city=<city>&category=<service category ID>&limit=<max results>
+        :return: 400, 200
+    """
+    query: str = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"message": "Search query 'q' is required"}), 400
+
+    category_id = request.args.get("category", type=int)
+    limit: int = max(1, min(request.args.get("limit", SEARCH_RESULTS, type=int), MAX_SEARCH_RESULTS))
+    results: list = search_services(query, city=request.args.get("city"), category_id=category_id, limit=limit)
+
+    all_results: list = []
+    for service, business, category_name, score in results:
+        all_results.append({
+            "serviceInfo": serialize_service(service),
+            "businessInfo": {
+                "id": business.id,
+                "business_name": business.business_name,
+                "slug": business.slug,
+                "city": business.city,
+                "rating": business.rating,
+                "profile_img": business.profile_img
+            },
+            "category": category_name,
+            "score": round(score, 4)
+        })
+
+    return jsonify({"message": "Success", "results": all_results}), 200
 
 
 @services_blueprint.route("/retrieve/<int:service_id>", methods=["GET"])
@@ -62,9 +158,8 @@ def retrieve_service(service_id):
     if not service:
         return jsonify({"message": "Not found"}), 404
     serialized_service: dict = serialize_service(service)
-    estimated_time: float = serialized_service.pop("estimated_service_time")
-    hours: int = int(estimated_time)
-    minutes: int = int((estimated_time - hours) * 60)
+    serialized_service.pop("estimated_service_time")
+    hours, minutes = divmod(service_duration(service) // timedelta(minutes=1), 60)
 
     if minutes == 0:
         estimated_time_string = f"{hours} Hour(s)"
@@ -124,10 +219,17 @@ def update_service(business: Business, service_id: int):
     service.service = service_name if service_name != "" else service.service
     service.price = price if price != "" else service.price
     service.description = description if description != "" else service.description
-    service.estimated_service_time = estimated_service_time if estimated_service_time != "" else service.estimated_service_time
+    if estimated_service_time != "":
+        try:
+            service.duration_minutes = hours_to_minutes(estimated_service_time)
+        except ValueError:
+            return jsonify({"message": "Estimate Time should be a number"}), 400
+        service.estimated_service_time = estimated_service_time
     service.service_category = service_category if service_category != "" else service.service_category
 
     db.session.commit()
+    invalidate_business_profile(business.slug)
+    discovery_index.refresh(business.id)
 
     return jsonify({"message": "Service Update successfully", "service": serialize_service(service)}), 200
 
@@ -152,6 +254,8 @@ def delete_service(business: Business, service_id: int):
 
     db.session.delete(service)
     db.session.commit()
+    invalidate_business_profile(business.slug)
+    discovery_index.refresh(business.id)
 
     return jsonify({"message": "Service Deleted successfully"}), 200
 
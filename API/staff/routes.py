@@ -1,6 +1,6 @@
 from API import db
-from API.lib.utils import add_decimal_hours_to_time
-from API.models import Staff, Appointment, StaffAvailability, Business
+from API.lib.staff_schedule import StaffSchedule
+from API.models import Staff, StaffAvailability, Business
 from flask import jsonify, Blueprint, request
 from API.lib.auth import business_login_required, verify_api_key, business_verification_required
 from API.lib.data_serializer import serialize_staff
@@ -182,21 +182,14 @@ def fetch_staff_unavailability(staff_id):
         if not staff:
             return jsonify({"message": "Staff not found"}), 404
 
-        staff_unavailability = staff.availability.filter_by(date=date).all()
-        staff_appointments = staff.appointments.filter(Appointment.date >= date).all()
+        schedule = StaffSchedule.load(staff.id, date)
+        requested_at = datetime.combine(date, time)
 
-        if staff_unavailability:
-            for period in staff_unavailability:
-                if period.end_time > time > period.start_time:
-                    return jsonify({"message": "Staff not Available at this time"}), 400
+        if schedule.is_blocked(requested_at, requested_at):
+            return jsonify({"message": "Staff not Available at this time"}), 400
 
-        for appointment in staff_appointments:
-            # Add the estimated time it takes to complete the services
-            appointment_completion_time = appointment.service[0].estimated_service_time  # How long an appointment takes
-            appointment_finish_time = add_decimal_hours_to_time(appointment.time, float(appointment_completion_time))
-
-            if appointment_finish_time > time > appointment.time:
-                return jsonify({"message": "Staff is booked at this time"}), 400
+        if schedule.is_booked(requested_at, requested_at):
+            return jsonify({"message": "Staff is booked at this time"}), 400
         return jsonify({"message": "Staff is available"}), 200
     except Exception:
         return jsonify({"message": "Failed to check staff availability due to an unexpected issue"}), 400
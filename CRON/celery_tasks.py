@@ -1,8 +1,12 @@
 import json
 import logging
+import random
+from datetime import datetime, timedelta
 
-from API import db, celery
+from API import db, celery, mail_transport
 from API.models import FailedNotification
+from API.lib.mail_transport import MailTransportUnavailable
+from API.lib.notification_router import rate_limits, CHANNEL_PROVIDERS, EMAIL, THROTTLE_WAIT_SECONDS
 from API.lib.send_mail import (
     appointment_confirmation_email,
     send_ask_for_review_mail
@@ -11,65 +15,150 @@ from API.lib.send_mail import (
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Rows claimed, sent over one SMTP connection and committed together
+RESEND_BATCH_SIZE = 50
+# Batches a single run works through before handing over to the next scheduled run
+MAX_BATCHES_PER_RUN = 20
+# Extra drainers started when a run finds a full batch. They split the backlog through SKIP LOCKED
+RESEND_PARALLELISM = 4
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+
+
+def next_attempt(retry_count, now):
+    """
+    Exponential backoff with 10% jitter: 1, 2, 4, 8... minutes, capped at RETRY_MAX_DELAY.
+    """
+    delay = min(RETRY_BASE_DELAY * 2 ** retry_count, RETRY_MAX_DELAY)
+    return now + delay * random.uniform(0.9, 1.1)
+
+
+def claim_batch(now):
+    """
+    Lock the next due notifications. Rows locked by another worker are skipped, not waited on.
+    The locks are held until the batch is committed.
+    """
+    return FailedNotification.query.filter(
+        FailedNotification.retry_count < FailedNotification.max_retries,
+        FailedNotification.next_attempt_at <= now
+    ).order_by(FailedNotification.next_attempt_at) \
+        .limit(RESEND_BATCH_SIZE) \
+        .with_for_update(skip_locked=True) \
+        .all()
+
+
+def message_params(notification):
+    """Rows logged before the column was written as JSON hold a JSON encoded string"""
+    params = notification.message_params
+    return json.loads(params) if isinstance(params, str) else params
+
+
+def resend(notification, connection):
+    """
+    Send one failed notification again. Failures are left to the caller to record.
+    """
+    params = message_params(notification)
+
+    if notification.notification_type == 'appointment_confirmation':
+        return appointment_confirmation_email(
+            params['client_name'],
+            params['date'],
+            params['time'],
+            params['business_name'],
+            params['business_address'],
+            params['latitude'],
+            params['longitude'],
+            params['place_id'],
+            notification.recipient,
+            log_failure=False,
+            connection=connection
+        )
+    if notification.notification_type == 'ask_for_review':
+        return send_ask_for_review_mail(
+            params['url'],
+            params['name'],
+            params['business_name'],
+            notification.recipient,
+            log_failure=False,
+            connection=connection
+        )
+    raise ValueError(f"Unknown notification type '{notification.notification_type}'")
+
+
+def record_failure(notification, now, error=None):
+    notification.retry_count += 1
+    notification.next_attempt_at = next_attempt(notification.retry_count, now)
+    if error:
+        notification.error_message = str(error)
+
+
+def process_batch(batch, results):
+    """
+    Send a claimed batch over one SMTP connection and commit the outcome once.
+    Sends share the SMTP rate limit with the notification tasks; a throttled row is retried
+    after RETRY_BASE_DELAY without using up a retry.
+    """
+    now = datetime.utcnow()
+    smtp_limit = rate_limits[CHANNEL_PROVIDERS[EMAIL]]
+    pending = list(batch)
+    try:
+        with mail_transport.connection() as connection:
+            while pending:
+                if not smtp_limit.acquire(THROTTLE_WAIT_SECONDS):
+                    logger.warning(f"SMTP rate limit reached, deferring {len(pending)} notifications")
+                    for notification in pending:
+                        notification.next_attempt_at = now + RETRY_BASE_DELAY
+                    results['throttled'] += len(pending)
+                    pending = []
+                    break
+
+                notification = pending[0]
+                try:
+                    sent = resend(notification, connection)
+                except MailTransportUnavailable:
+                    raise
+                except Exception as e:
+                    pending.pop(0)
+                    record_failure(notification, now, e)
+                    results['failed'] += 1
+                    continue
+
+                pending.pop(0)
+                if sent:
+                    db.session.delete(notification)
+                    results['success'] += 1
+                else:
+                    record_failure(notification, now)
+                    results['failed'] += 1
+    except MailTransportUnavailable as e:
+        # The SMTP server is unreachable; the rest of the batch, including the row being sent, backs off
+        logger.warning(f"SMTP connection failed, rescheduling {len(pending)} notifications: {str(e)}")
+        for notification in pending:
+            record_failure(notification, now, e)
+        results['failed'] += len(pending)
+
+    db.session.commit()
+
+
 @celery.task
-def resend_failed_notifications():
+def resend_failed_notifications(spawn=RESEND_PARALLELISM - 1):
     """
-    Celery task to resend failed notifications.
+    Celery task to resend failed notifications that are due.
+    Rows are claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent runs drain
+    the backlog in parallel without sending a notification twice.
+    :param spawn: Extra runs this run may start when there is a backlog
     """
-    failed_notifications = FailedNotification.query.filter(
-        FailedNotification.retry_count < FailedNotification.max_retries
-    ).all()
-    
-    results = {'attempted': len(failed_notifications), 'success': 0, 'failed': 0}
-    logger.info(f"Starting resend task: {results['attempted']} notifications to process")
-
-    for notification in failed_notifications:
-        try:
-            params = json.loads(notification.message_params)
-            logger.info(f"Processing notification {notification.id} of type '{notification.notification_type}' to {notification.recipient}")
-
-            success = False
-
-            if notification.notification_type == 'appointment_confirmation':
-                success = appointment_confirmation_email(
-                    params['client_name'],
-                    params['date'],
-                    params['time'],
-                    params['business_name'],
-                    params['business_address'],
-                    params['latitude'],
-                    params['longitude'],
-                    params['place_id'],
-                    notification.recipient
-                )
-            elif notification.notification_type == 'ask_for_review':
-                success = send_ask_for_review_mail(
-                    params['url'],
-                    params['name'],
-                    params['business_name'],
-                    notification.recipient
-                )
-
-            if success:
-                db.session.delete(notification)
-                results['success'] += 1
-                logger.info(f"Notification {notification.id} sent successfully and deleted.")
-            else:
-                notification.retry_count += 1
-                results['failed'] += 1
-                logger.warning(f"Notification {notification.id} failed to send. Retry count increased to {notification.retry_count}.")
-
-        except Exception as e:
-            notification.retry_count += 1
-            notification.error_message = str(e)
-            results['failed'] += 1
-            logger.warning(
-                f"Notification {notification.id} failed to send. "
-                f"Retry count increased to {notification.retry_count}. "
-                f"Error: {str(e)}"
-                )   
-
-        db.session.commit()
+    results = {'attempted': 0, 'success': 0, 'failed': 0, 'throttled': 0}
+
+    for batch_number in range(MAX_BATCHES_PER_RUN):
+        batch = claim_batch(datetime.utcnow())
+        if not batch:
+            break
+        if batch_number == 0 and len(batch) == RESEND_BATCH_SIZE and spawn > 0:
+            resend_failed_notifications.delay(spawn - 1)
+
+        results['attempted'] += len(batch)
+        process_batch(batch, results)
 
     logger.info(f"Resend task completed: {results}")
     return results
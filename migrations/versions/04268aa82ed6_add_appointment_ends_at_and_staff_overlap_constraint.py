@@ -0,0 +1,83 @@
+"""Add appointment ends_at and staff overlap exclusion constraint
+
+Revision ID: 04268aa82ed6
+Revises: 5aa420ea0c63
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04268aa82ed6'
+down_revision = '5aa420ea0c63'
+branch_labels = None
+depends_on = None
+
+
+appointments = sa.table(
+    'appointments',
+    sa.column('id', sa.Integer),
+    sa.column('date', sa.Date),
+    sa.column('time', sa.Time),
+    sa.column('ends_at', sa.DateTime),
+    sa.column('service_id', sa.Integer)
+)
+services = sa.table(
+    'services',
+    sa.column('id', sa.Integer),
+    sa.column('estimated_service_time', sa.String)
+)
+
+
+def upgrade():
+    with op.batch_alter_table('appointments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ends_at', sa.DateTime(), nullable=True))
+
+    # Backfill ends_at from each appointment's service duration (decimal hours)
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(appointments.c.id, appointments.c.date, appointments.c.time, services.c.estimated_service_time)
+        .select_from(appointments.outerjoin(services, appointments.c.service_id == services.c.id))
+    ).fetchall()
+    for appointment_id, date_, time_, estimated_service_time in rows:
+        try:
+            minutes = int(float(estimated_service_time) * 60) if estimated_service_time else 0
+        except ValueError:
+            minutes = 0
+        connection.execute(
+            appointments.update()
+            .where(appointments.c.id == appointment_id)
+            .values(ends_at=datetime.combine(date_, time_) + timedelta(minutes=minutes))
+        )
+
+    if connection.dialect.name == 'postgresql':
+        overlaps = connection.execute(sa.text("""
+            SELECT count(*) FROM appointments a
+            JOIN appointments b ON a.staff_id = b.staff_id AND a.id < b.id
+            WHERE NOT a.cancelled AND NOT b.cancelled
+              AND tsrange(a."date" + a."time", a.ends_at) && tsrange(b."date" + b."time", b.ends_at)
+        """)).scalar()
+        if overlaps:
+            raise RuntimeError(
+                f"{overlaps} overlapping staff bookings exist. "
+                "Cancel or reassign them before adding the appointments_staff_no_overlap constraint."
+            )
+
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute("""
+            ALTER TABLE appointments ADD CONSTRAINT appointments_staff_no_overlap
+            EXCLUDE USING gist (staff_id WITH =, tsrange("date" + "time", ends_at) WITH &&)
+            WHERE (NOT cancelled AND staff_id IS NOT NULL AND ends_at IS NOT NULL)
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE appointments DROP CONSTRAINT IF EXISTS appointments_staff_no_overlap')
+
+    with op.batch_alter_table('appointments', schema=None) as batch_op:
+        batch_op.drop_column('ends_at')
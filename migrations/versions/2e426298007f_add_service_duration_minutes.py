@@ -0,0 +1,46 @@
+"""Add service duration_minutes
+
+Revision ID: 2e426298007f
+Revises: 04268aa82ed6
+Create Date: 2026-10-18 10:03:17.552981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e426298007f'
+down_revision = '04268aa82ed6'
+branch_labels = None
+depends_on = None
+
+
+services = sa.table(
+    'services',
+    sa.column('id', sa.Integer),
+    sa.column('estimated_service_time', sa.String),
+    sa.column('duration_minutes', sa.Integer)
+)
+
+
+def upgrade():
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duration_minutes', sa.Integer(), nullable=True))
+
+    # Backfill from the decimal hours stored in estimated_service_time
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(services.c.id, services.c.estimated_service_time)).fetchall()
+    for service_id, estimated_service_time in rows:
+        try:
+            minutes = int(float(estimated_service_time) * 60) if estimated_service_time else 0
+        except ValueError:
+            continue
+        connection.execute(
+            services.update().where(services.c.id == service_id).values(duration_minutes=minutes)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.drop_column('duration_minutes')
@@ -0,0 +1,42 @@
+"""Add full-text and trigram search indexes for services and businesses
+
+Revision ID: 917c6db0fc24
+Revises: 541aafec77f2
+Create Date: 2026-10-18 14:02:36.517290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '917c6db0fc24'
+down_revision = '541aafec77f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Search falls back to LIKE matching on other databases (API/lib/search.py)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Expressions must match service_document() and business_document() in API/lib/search.py
+    op.execute("""
+        CREATE INDEX ix_services_search ON services
+        USING gin (to_tsvector('simple', coalesce(service, '') || ' ' || coalesce(description, '')))
+    """)
+    op.execute("CREATE INDEX ix_businesses_search ON businesses USING gin (to_tsvector('simple', business_name))")
+    op.execute('CREATE INDEX ix_services_service_trgm ON services USING gin (lower(service) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_businesses_business_name_trgm ON businesses USING gin (lower(business_name) gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_businesses_business_name_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_services_service_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_businesses_search')
+    op.execute('DROP INDEX IF EXISTS ix_services_search')
@@ -0,0 +1,31 @@
+"""Add price to sales
+
+Revision ID: be591732a2e8
+Revises: f3d40e3d93dc
+Create Date: 2026-10-18 19:02:37.114920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be591732a2e8'
+down_revision = 'f3d40e3d93dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price', sa.Integer(), nullable=True))
+
+    # Past sale prices were never recorded; the current service price is the best available
+    op.execute(
+        "UPDATE sales SET price = (SELECT services.price FROM services WHERE services.id = sales.service_id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.drop_column('price')
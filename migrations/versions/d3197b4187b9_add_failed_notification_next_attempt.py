@@ -0,0 +1,34 @@
+"""Add next_attempt_at to failed_notifications
+
+Revision ID: d3197b4187b9
+Revises: 4e237087329f
+Create Date: 2026-10-18 16:12:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3197b4187b9'
+down_revision = '4e237087329f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('failed_notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+    # Existing rows are due straight away
+    op.execute("UPDATE failed_notifications SET next_attempt_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+
+    with op.batch_alter_table('failed_notifications', schema=None) as batch_op:
+        batch_op.alter_column('next_attempt_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_failed_notifications_next_attempt_at'), ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('failed_notifications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_failed_notifications_next_attempt_at'))
+        batch_op.drop_column('next_attempt_at')
@@ -0,0 +1,36 @@
+import os
+
+# Config reads the environment on import. PAMBA_DB may point at a Postgres database for the tests that need one
+os.environ.setdefault("PAMBA_DB", "sqlite://")
+os.environ.setdefault("SECRET", "test-secret")
+
+import pytest
+
+from API import create_app, db
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+@pytest.fixture
+def database(app):
+    """Empty schema created from the models, dropped after the test"""
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def sent_mail(monkeypatch):
+    """Messages handed to the mail transport instead of an SMTP server"""
+    from API import mail_transport
+
+    messages = []
+    monkeypatch.setattr(mail_transport, "send", messages.append)
+    return messages
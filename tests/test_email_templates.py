@@ -0,0 +1,72 @@
+import time
+from datetime import date, time as dt_time
+
+from flask import render_template
+
+from API import email_templates
+from API.lib.email_templates import NOTIFICATION_TEMPLATES
+from API.lib.send_mail import (
+    send_otp,
+    send_reset_email,
+    sent_client_reset_token,
+    business_account_activation_email,
+    appointment_confirmation_email,
+    send_ask_for_review_mail
+)
+
+BENCHMARK_RENDERS = 10_000
+
+
+def test_every_helper_renders_its_template(app, sent_mail):
+    # Called the way the routes and tasks call them, so the helpers' own render() kwargs are exercised
+    with app.app_context():
+        assert send_otp("jane@example.com", "123456", "Jane")
+        assert send_reset_email("owner@example.com", "reset-token", "Kinyozi")
+        assert sent_client_reset_token("jane@example.com", "https://www.pamba.africa/reset/abc", "Jane")
+        assert business_account_activation_email("owner@example.com", "verify-token", "Kinyozi")
+        assert appointment_confirmation_email(
+            "Jane", date(2026, 1, 2), dt_time(9, 30), "Kinyozi", "Moi Avenue",
+            -1.28, 36.82, "place-id", "jane@example.com", log_failure=False
+        )
+        assert send_ask_for_review_mail(
+            "https://www.pamba.africa/review/abc", "Jane", "Kinyozi", "jane@example.com", log_failure=False
+        )
+
+    assert len(sent_mail) == len(NOTIFICATION_TEMPLATES)
+    for message in sent_mail:
+        assert "{{" not in message.html
+    assert "123456" in sent_mail[0].html
+    assert "verify-token" in sent_mail[3].html
+    assert "2026-01-02" in sent_mail[4].html
+    assert "Kinyozi" in sent_mail[5].html
+
+
+def test_render_takes_a_name_variable(app):
+    html = email_templates.render("otp.html", name="Jane", code="654321")
+    assert "Jane" in html and "654321" in html
+
+
+def test_render_benchmark(app):
+    context = dict(
+        name="Jane",
+        appointment_date="2026-01-02",
+        appointment_time="09:30:00",
+        business_name="Kinyozi",
+        business_address="Moi Avenue",
+        business_direction="https://www.google.com/maps/search/?api=1&query=-1.28,36.82"
+    )
+    with app.app_context():
+        started = time.perf_counter()
+        for _ in range(BENCHMARK_RENDERS):
+            render_template("confirmAppointment.html", **context)
+        per_call = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(BENCHMARK_RENDERS):
+            email_templates.render("confirmAppointment.html", **context)
+        precompiled = time.perf_counter() - started
+
+        assert email_templates.render("confirmAppointment.html", **context) == \
+            render_template("confirmAppointment.html", **context)
+
+    print(f"\n{BENCHMARK_RENDERS} renders: render_template {per_call:.3f}s, precompiled {precompiled:.3f}s")
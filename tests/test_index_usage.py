@@ -0,0 +1,99 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from API.lib.auth import generate_token
+from API.lib.staff_schedule import StaffSchedule
+from API.models import Appointment, Business, Client, Expense, Sale, Service, Staff
+
+API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def postgres(database):
+    if database.engine.dialect.name != "postgresql":
+        pytest.skip("EXPLAIN plans are only checked on Postgres; point PAMBA_DB at a Postgres test database")
+    return database
+
+
+@pytest.fixture
+def business(postgres, monkeypatch):
+    monkeypatch.setenv("API_KEY", API_KEY)
+    business = Business(business_name="Kinyozi", slug="kinyozi", email="owner@example.com", phone="0700000000",
+                        city="Nairobi", active=True, verified=True, profile_completed=True)
+    client = Client(name="Jane Doe", email="jane@example.com", phone="0711111111")
+    postgres.session.add_all([business, client])
+    postgres.session.flush()
+    service = Service(service="Haircut", price=500, business_id=business.id)
+    staff = Staff(f_name="Otieno", phone="0722222222", role="Barber", public_id="otieno", employer_id=business.id)
+    postgres.session.add_all([service, staff])
+    postgres.session.flush()
+
+    today = datetime.today().date()
+    for offset in range(20):
+        day = today - timedelta(days=offset)
+        postgres.session.add_all([
+            Appointment(date=day, time=time(9), business_id=business.id, client_id=client.id, service_id=service.id,
+                        staff_id=staff.id, cancelled=False, completed=False),
+            Sale(payment_method="cash", business_id=business.id, service_id=service.id, price=500,
+                 date_created=datetime.combine(day, time(10))),
+            Expense(expense="Supplies", amount=50, description="Supplies", business_id=business.id,
+                    created_at=datetime.combine(day, time(11)))
+        ])
+    postgres.session.commit()
+    postgres.session.execute(postgres.text("ANALYZE"))
+    return business, staff
+
+
+def plans(database, action):
+    """EXPLAIN output of every SELECT issued by action, planned with sequential scans disabled"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(database.engine, "before_cursor_execute", capture)
+    try:
+        action()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", capture)
+
+    # The tables are tiny; this asks whether an index can serve the query, not whether it's cheaper yet
+    with database.engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        return [
+            "\n".join(row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters))
+            for statement, parameters in captured
+        ]
+
+
+def uses(index, query_plans):
+    return any(index in plan for plan in query_plans)
+
+
+def test_booking_conflict_check_uses_staff_date_index(business, postgres):
+    _, staff = business
+    staff_id = staff.id
+
+    query_plans = plans(postgres, lambda: StaffSchedule.load(staff_id, date.today()))
+
+    assert uses("ix_appointments_staff_id_date", query_plans), query_plans
+
+
+def test_dashboard_uses_business_indexes(app, business, postgres):
+    owner, _ = business
+    token = generate_token(datetime.utcnow() + timedelta(hours=1), owner.slug)
+
+    def load_dashboard():
+        response = app.test_client().get(
+            "/API/businesses/analysis?lifetime=true", headers={"X-API-KEY": API_KEY, "x-access-token": token}
+        )
+        assert response.status_code == 200, response.get_json()
+
+    query_plans = plans(postgres, load_dashboard)
+
+    assert uses("ix_appointments_business_id_date_cancelled", query_plans), query_plans
+    assert uses("ix_sales_business_id_date_created", query_plans), query_plans
+    assert uses("ix_expenses_business_id_created_at", query_plans), query_plans
@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+
+from API.models import NotificationDispatch
+from API.lib.notification_tasks import mark_sent, purge_notification_dispatches, DISPATCH_RETENTION
+
+
+def test_purge_keeps_keys_within_retention(database):
+    database.session.add(NotificationDispatch(key="otp:old", notification_type="otp",
+                                              sent_at=datetime.utcnow() - DISPATCH_RETENTION - timedelta(hours=1)))
+    database.session.commit()
+    mark_sent("otp:recent", "otp")
+
+    assert purge_notification_dispatches() == 1
+    assert database.session.get(NotificationDispatch, "otp:old") is None
+    assert database.session.get(NotificationDispatch, "otp:recent") is not None
+
+
+def test_keys_are_stored_in_naive_utc(database):
+    mark_sent("otp:naive", "otp")
+
+    sent_at = database.session.get(NotificationDispatch, "otp:naive").sent_at
+    assert sent_at.tzinfo is None
+    assert abs(datetime.utcnow() - sent_at) < timedelta(minutes=1)
@@ -0,0 +1,104 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from API.lib.auth import generate_token
+from API.models import (
+    Appointment, Business, Client, Expense, ExpenseAccount, Review, Sale, Service, ServiceCategories, Staff
+)
+
+API_KEY = "test-api-key"
+OWNER_SLUG = "kinyozi"
+CLIENT_EMAIL = "jane@example.com"
+
+# List endpoints whose rows are loaded with their relationships (API.lib.query_options)
+LIST_ENDPOINTS = (
+    ("/API/appointments/my-appointments", "client"),
+    ("/API/appointments/business-appointments", "business"),
+    ("/API/businesses/all-businesses", None),
+    (f"/API/businesses/business-services/{OWNER_SLUG}", None),
+    ("/API/clients/business-clients", "business"),
+    ("/API/expenses/my-expenses", "business"),
+    (f"/API/reviews/all/{OWNER_SLUG}", None),
+    ("/API/sales/all", "business"),
+)
+
+
+@pytest.fixture
+def owner(database, monkeypatch):
+    monkeypatch.setenv("API_KEY", API_KEY)
+    business = Business(business_name="Kinyozi", slug=OWNER_SLUG, email="owner@example.com", phone="0700000000",
+                        city="Nairobi", active=True, verified=True, profile_completed=True)
+    client = Client(name="Jane Doe", email=CLIENT_EMAIL, phone="0711111111")
+    database.session.add_all([business, client])
+    database.session.commit()
+    return business, client
+
+
+def add_rows(db, business, client, start, count):
+    """count rows of every listed kind, each pointing at its own related rows so lazy loads can't hit the identity map"""
+    for i in range(start, start + count):
+        category = ServiceCategories(category_name=f"Category {i}")
+        service = Service(service=f"Service {i}", price=100 + i, business_id=business.id, category=category)
+        staff = Staff(f_name=f"Staff {i}", phone=f"07200000{i:02}", role="Barber", public_id=f"staff-{i}",
+                      employer_id=business.id)
+        other_client = Client(name=f"Client {i}", email=f"client{i}@example.com", phone=f"07300000{i:02}")
+        account = ExpenseAccount(account_name=f"Account {i}", business_id=business.id)
+        listed = Business(business_name=f"Shop {i}", slug=f"shop-{i}", email=f"shop{i}@example.com",
+                          phone=f"07400000{i:02}", city="Nairobi", active=True, verified=True, profile_completed=True)
+        db.session.add_all([category, service, staff, other_client, account, listed])
+        db.session.flush()
+
+        day = date(2026, 1, 1) + timedelta(days=i)
+        db.session.add_all([
+            Appointment(date=day, time=time(9), business_id=business.id, client_id=other_client.id,
+                        service_id=service.id, staff_id=staff.id, cancelled=False, completed=False),
+            Appointment(date=day, time=time(10), business_id=listed.id, client_id=client.id,
+                        service_id=service.id, cancelled=False, completed=False),
+            Sale(payment_method="cash", business_id=business.id, service_id=service.id, price=service.price,
+                 date_created=datetime.combine(day, time(11))),
+            Expense(expense=f"Expense {i}", amount=50, description="Supplies", business_id=business.id,
+                    expense_account=account.id, created_at=datetime.combine(day, time(12))),
+            Review(message="Great", client_id=other_client.id, business_id=business.id),
+            Review(message="Nice", client_id=other_client.id, business_id=listed.id)
+        ])
+    db.session.commit()
+
+
+def headers(role):
+    result = {"X-API-KEY": API_KEY}
+    if role:
+        username = OWNER_SLUG if role == "business" else CLIENT_EMAIL
+        result["x-access-token"] = generate_token(datetime.utcnow() + timedelta(hours=1), username)
+    return result
+
+
+def statements(app, database, path, role):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", count)
+    try:
+        response = app.test_client().get(path, headers=headers(role))
+    finally:
+        event.remove(database.engine, "before_cursor_execute", count)
+    database.session.remove()
+    assert response.status_code == 200, response.get_json()
+    return len(executed)
+
+
+@pytest.mark.parametrize("path, role", LIST_ENDPOINTS)
+def test_list_endpoint_query_count_is_independent_of_rows(app, owner, database, path, role):
+    business, client = owner
+    business_id, client_id = business.id, client.id
+
+    add_rows(database, business, client, 0, 2)
+    few = statements(app, database, path, role)
+
+    add_rows(database, database.session.get(Business, business_id), database.session.get(Client, client_id), 2, 6)
+    many = statements(app, database, path, role)
+
+    assert many == few
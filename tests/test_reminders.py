@@ -0,0 +1,72 @@
+from datetime import date, time
+
+import pytest
+
+from API.models import Appointment, Business, Client, Service, NotificationDispatch
+from API.lib import notification_tasks
+from API.lib.notification_tasks import send_appointment_reminders, reminder_key
+
+DAY = date(2026, 3, 2)
+
+
+@pytest.fixture
+def sent_messages(monkeypatch):
+    messages = []
+
+    def send(channel, phone, message, wait=None):
+        messages.append((channel, phone, message))
+        return True
+
+    monkeypatch.setattr(notification_tasks, "send_message", send)
+    return messages
+
+
+def add_appointments(db):
+    business = Business(business_name="Kinyozi", slug="kinyozi", email="owner@example.com", phone="0700000000",
+                        city="Nairobi")
+    client = Client(name="Jane Doe", email="jane@example.com", phone="0711111111")
+    service = Service(service="Haircut", price=500, business=business)
+    db.session.add_all([business, client, service])
+    db.session.flush()
+    complete = Appointment(date=DAY, time=time(9), business_id=business.id, client_id=client.id,
+                           service_id=service.id, cancelled=False, completed=False)
+    # Its service was deleted (ON DELETE SET NULL)
+    orphaned = Appointment(date=DAY, time=time(10), business_id=business.id, client_id=client.id,
+                           service_id=None, cancelled=False, completed=False)
+    db.session.add_all([complete, orphaned])
+    db.session.commit()
+    return complete, orphaned
+
+
+def test_appointment_without_service_is_skipped_unclaimed(database, sent_messages):
+    complete, orphaned = add_appointments(database)
+
+    results = send_appointment_reminders(DAY.isoformat())
+
+    assert results == {"attempted": 1, "sent": 1, "failed": 0, "skipped": 1}
+    assert len(sent_messages) == 1 and "Jane" in sent_messages[0][2]
+    assert database.session.get(NotificationDispatch, reminder_key(complete.id)) is not None
+    assert database.session.get(NotificationDispatch, reminder_key(orphaned.id)) is None
+
+
+def test_rerun_skips_sent_reminders(database, sent_messages):
+    add_appointments(database)
+
+    send_appointment_reminders(DAY.isoformat())
+    results = send_appointment_reminders(DAY.isoformat())
+
+    assert results["sent"] == 0
+    assert len(sent_messages) == 1
+
+
+def test_failed_send_releases_its_claim(database, monkeypatch):
+    complete, _ = add_appointments(database)
+
+    def send(channel, phone, message, wait=None):
+        raise ConnectionError("provider down")
+
+    monkeypatch.setattr(notification_tasks, "send_message", send)
+    results = send_appointment_reminders(DAY.isoformat())
+
+    assert results["failed"] == 1
+    assert database.session.get(NotificationDispatch, reminder_key(complete.id)) is None